@@ -0,0 +1,236 @@
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data import read_derived, tmp_path_for
+from disk_cache import CACHE, cache_key
+from geography import build_rollup
+from profiling import stage
+from similarity import build_similarity_index
+from trends import build_tensor, clamp_window, trend_table, window_metrics
+
+
+# Headless versions of the Case 1 and Case 2 analyses. Nothing here touches
+# Streamlit: the functions return typed results that the pages only render,
+# and that `precompute.py` can compute once and save for the app to load.
+RESULTS_VERSION = 7
+RESULTS_DIR = Path(__file__).with_name('.results')
+
+
+@dataclass(frozen=True)
+class ClusterAnalysis:
+    specialty_mapping: dict         # specialty -> stable id
+    dept_specialty: pd.DataFrame    # departments x specialty ids
+    projection: pd.DataFrame        # PC1, PC2 and 'Cluster' per department
+    explained_variance: np.ndarray
+    cluster_members: dict           # cluster -> list of departments
+    cluster_totals: pd.DataFrame    # specialty ids x 'Cluster k' sums
+    focus_cluster: int
+    focus_comparison: pd.DataFrame  # focus cluster sum vs. average department elsewhere
+    model_selection: object         # models.SweepResult over k and component counts, None for filtered subsets
+
+
+@dataclass(frozen=True)
+class TrendAnalysis:
+    trends: pd.DataFrame            # years x specialties
+    totals: pd.Series               # accreditations per specialty, all years
+    highest: list                   # 5 specialties with the most accreditations
+    lowest: list                    # 5 specialties with the fewest accreditations
+    start_year: int
+    end_year: int
+    growth: pd.Series               # end_year - start_year, most growth first
+    declining: pd.DataFrame         # 'Decline' and 'Peak Year' of declining specialties
+    gynecology_decline: pd.Series   # end_year - start_year per department, largest decline first
+    tensor: object                  # trends.TrendTensor, for other windows
+    departments: pd.DataFrame       # trends.trend_table of every specialty x department pair
+
+
+@dataclass(frozen=True)
+class Results:
+    version: int
+    fingerprint: str
+    clusters: ClusterAnalysis       # None if a filtered subset is too small to cluster
+    trends: TrendAnalysis
+    geography: object               # geography.GeoRollup: national, region and department counts
+    similarity: object              # similarity.SimilarityIndex over the departments' specialty profiles
+
+
+def specialty_distribution(cube):
+    # Department x specialty counts, with the specialties replaced by their ids
+    table = cube.table('Département', 'Spécialité')
+    mapping = {specialty: int(cube.labels['Spécialité'].get_loc(specialty)) for specialty in table.columns}
+    table.columns = pd.Index([mapping[specialty] for specialty in table.columns], name='Specialty_Encoded')
+    return mapping, table
+
+
+def cluster_departments(cube, n_components=2, n_clusters=3, random_state=42, focus_cluster=2, sweep=True):
+    # Case 1: PCA of the department x specialty matrix, clustered with KMeans.
+    # None when a filtered cube has too few departments or specialties to fit.
+    # sweep=False skips the model selection evidence (model_selection is None).
+    with stage('department_table'):
+        mapping, table = specialty_distribution(cube)
+    if len(table) <= n_clusters or len(table.columns) < n_components:
+        return None
+
+    # sklearn is only imported when a fit is needed, not to read saved results
+    with stage('import_models'):
+        from models import fit_projection, sweep_clusters
+
+    with stage('fit_projection'):
+        fit = fit_projection(table, n_components=n_components, n_clusters=n_clusters, random_state=random_state)
+    # Evidence for the choice of k: the configuration the sweep would select
+    selection = None
+    if sweep:
+        with stage('sweep_clusters'):
+            selection = sweep_clusters(table, cluster_counts=range(2, 9), component_counts=(2, 3))
+    clusters = fit.projection['Cluster']
+
+    members = {int(k): clusters.index[clusters == k].tolist() for k in range(n_clusters)}
+    totals = table.groupby(clusters).sum().T
+    totals.columns = [f'Cluster {k}' for k in totals.columns]
+
+    in_focus = clusters == focus_cluster
+    focus_comparison = pd.DataFrame({
+        f'Cluster {focus_cluster}': table.loc[in_focus].sum(),
+        'Other Clusters (Average)': table.loc[~in_focus].mean(),
+    })
+    return ClusterAnalysis(
+        specialty_mapping=mapping,
+        dept_specialty=table,
+        projection=fit.projection,
+        explained_variance=fit.explained_variance,
+        cluster_members=members,
+        cluster_totals=totals,
+        focus_cluster=focus_cluster,
+        focus_comparison=focus_comparison,
+        model_selection=selection,
+    )
+
+
+def accreditation_trends(cube, start_year=2020, end_year=2024, specialty='Gynécologie-obstétrique', rolling=3):
+    # Case 2: accreditations per year and specialty, growth between two years
+    # (narrowed to the years in the data) and the per-department change of
+    # every specialty, from the trend engine
+    with stage('trend_tensor'):
+        tensor = build_tensor(cube)
+    trends = tensor.by_specialty()
+    trends = trends.loc[:, trends.sum() > 0]
+    totals = trends.sum()
+    start_year, end_year = clamp_window(tensor.years, start_year, end_year)
+
+    national = window_metrics(trends.to_numpy(), trends.index, start_year, end_year, rolling)
+    growth = pd.Series(national['Growth'], index=trends.columns)
+    declining = growth[growth < 0].sort_values()
+    # Peak over all the years of the data, not only the compared window
+    declining = pd.DataFrame({
+        'Decline': declining,
+        'Peak Year': trends[declining.index].idxmax(),
+    })
+
+    with stage('trend_table'):
+        departments = trend_table(tensor, start_year, end_year, rolling)
+    if specialty in departments.index.get_level_values('Spécialité'):
+        department_change = departments.xs(specialty, level='Spécialité')['Growth'].rename(None)
+    else:
+        department_change = pd.Series(dtype=int, index=pd.Index([], name='Département'))
+
+    return TrendAnalysis(
+        trends=trends,
+        totals=totals,
+        highest=totals.nlargest(5).index.tolist(),
+        lowest=totals.nsmallest(5).index.tolist(),
+        start_year=start_year,
+        end_year=end_year,
+        growth=growth.sort_values(ascending=False),
+        declining=declining,
+        gynecology_decline=department_change.sort_values(ascending=True),
+        tensor=tensor,
+        departments=departments,
+    )
+
+
+def compute_results(dataset):
+    # Results of the whole dataset
+    return Results(
+        version=RESULTS_VERSION,
+        fingerprint=dataset.fingerprint,
+        **{name: compute_result(dataset, name) for name in RESULT_NAMES},
+    )
+
+
+# The analyses of Results, each rendered by its own page
+RESULT_NAMES = ['clusters', 'trends', 'geography', 'similarity']
+
+
+def compute_result(dataset, name, selection=None):
+    # One analysis of the whole dataset, or of the rows matching a
+    # filters.Selection: a filtered page only computes the analysis it renders
+    cube, years = dataset.cube, {}
+    if selection is not None:
+        with stage('filter'):
+            cube = dataset.filters.cube(selection)
+        # Growth over the selected period rather than the default years
+        if selection.dates is not None:
+            years = {'start_year': selection.dates[0].year, 'end_year': selection.dates[1].year}
+    if name == 'clusters':
+        # Filtered subsets keep the k and component count of the whole
+        # dataset, without the sweep that supports them
+        with stage('cluster_departments'):
+            return cluster_departments(cube, sweep=selection is None)
+    if name == 'trends':
+        with stage('accreditation_trends'):
+            return accreditation_trends(cube, **years)
+    if name == 'geography':
+        with stage('geography'):
+            return build_rollup(cube)
+    if name == 'similarity':
+        with stage('similarity'):
+            # Kept up to date by ingestion for the whole dataset
+            similarity = None if selection is not None else read_derived(dataset.fingerprint, 'similarity')
+            if similarity is None:
+                similarity = build_similarity_index(cube.table('Département', 'Spécialité'))
+            return similarity
+    raise ValueError(f'unknown result {name!r}, expected one of {RESULT_NAMES}')
+
+
+def cached_results(fingerprint, load_dataset):
+    # compute_results through the disk cache shared by the processes of the
+    # host. The dataset is only loaded (by calling load_dataset) on a miss.
+    key = cache_key('results', RESULTS_VERSION, fingerprint)
+    return CACHE.get_or_compute(key, lambda: compute_results(load_dataset()))
+
+
+def cached_result(fingerprint, load_dataset, name, selection):
+    # compute_result of a filtered subset through the disk cache
+    key = cache_key('result', RESULTS_VERSION, fingerprint, name, selection)
+    return CACHE.get_or_compute(key, lambda: compute_result(load_dataset(), name, selection))
+
+
+def results_path(fingerprint, directory=RESULTS_DIR):
+    return Path(directory) / f'results-v{RESULTS_VERSION}-{fingerprint[:16]}.pkl'
+
+
+def save_results(results, directory=RESULTS_DIR):
+    path = results_path(results.fingerprint, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_results(fingerprint, directory=RESULTS_DIR):
+    # Precomputed results for a dataset version, or None if there are none
+    path = results_path(fingerprint, directory)
+    if not path.exists():
+        return None
+    with stage('results_read'), open(path, 'rb') as f:
+        results = pickle.load(f)
+    if results.version != RESULTS_VERSION or results.fingerprint != fingerprint:
+        return None
+    return results
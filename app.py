@@ -1,7 +1,12 @@
+import functools
+import importlib
+
 import streamlit as st
-import pandas as pd
-from case1 import run_case_1
-from case2 import run_case_2
+
+import profiling
+import progressive
+from profiling import stage
+from resources import get_dataset, get_filtered_result, get_results
 
 # Page configuration: Set this as the first Streamlit command
 st.set_page_config(
@@ -10,19 +15,115 @@ st.set_page_config(
     layout="wide"
 )
 
-# Caching data loading for efficiency
-@st.cache_data
-def load_data():
-    data = pd.read_csv('medecin-accredites-has (2).csv')
-    return data
+# Page registry: each case module, and the scientific stack behind it, is
+# only imported the first time its page is opened. The last field names the
+# analysis result the page renders, "dataset" for the pages that get the
+# dataset, or None for the pages that load what they need themselves.
+PAGES = {
+    "Case 1: Specialty Distribution": ("case1", "run_case_1", "clusters"),
+    "Case 2: Accreditation Trends": ("case2", "run_case_2", "trends"),
+    "Regions and Departments": ("regions", "run_regions", "geography"),
+    "Similar Departments": ("neighbours", "run_neighbours", "similarity"),
+    "Establishments and Teams": ("network", "run_network", "dataset"),
+    "Practitioner and Team Lookup": ("lookup", "run_lookup", "dataset"),
+    "Data Quality": ("quality", "run_quality", "dataset"),
+    "Downloads": ("downloads", "run_downloads", None),
+}
+
+# Sidebar filters, off by default so that the cases open from the saved
+# results without loading the dataset. Returns a filters.Selection, or None.
+def sidebar_filters():
+    if not st.sidebar.toggle("Filter the data"):
+        return None
+    from filters import Selection
+    with stage("dataset", cache="dataset"):
+        index = get_dataset().filters
+    first_date, last_date = index.date_bounds()
+    dates = st.sidebar.slider("Accreditation date", min_value=first_date, max_value=last_date,
+                              value=(first_date, last_date), format="DD/MM/YYYY")
+    selection = Selection(
+        departments=tuple(st.sidebar.multiselect("Départements", index.options("Département"))),
+        specialties=tuple(st.sidebar.multiselect("Specialties", index.options("Spécialité"))),
+        oa=tuple(st.sidebar.multiselect("Accrediting bodies (OA)", index.options("OA"))),
+        statut=tuple(st.sidebar.multiselect("Statut", index.options("Statut"))),
+        # The full range also keeps the rows without a date
+        dates=None if dates == (first_date, last_date) else dates,
+    )
+    st.sidebar.caption(f"{index.count(selection):,} of {index.n_rows:,} accreditations selected")
+    return selection
 
-data = load_data()
+def render_page(page):
+    module_name, function_name, result_name = PAGES[page]
+    with stage("import"):
+        run_case = getattr(importlib.import_module(module_name), function_name)
+    if result_name is None:
+        with stage("page"):
+            run_case()
+        return
+    if result_name == "dataset":
+        with stage("dataset", cache="dataset"):
+            dataset = get_dataset()
+        with stage("page"):
+            run_case(dataset)
+        return
+    selection = sidebar_filters()
+    filtered = selection is not None and selection.active
+    if not filtered:
+        load = lambda: getattr(get_results(), result_name)
+    elif get_dataset().filters.count(selection) == 0:
+        st.warning("No accreditation matches the selected filters.")
+        return
+    else:
+        load = functools.partial(get_filtered_result, selection, result_name)
+    # The results are loaded (or computed) in the background while the page
+    # renders its narrative, and its sections fill in as they are ready.
+    # Filtered charts are drawn by the browser: rendering new PNGs for every
+    # change of the filters would take seconds.
+    notice = st.empty()
+    analysis = progressive.submit(load)
+    sections = progressive.Sections(native_charts=filtered)
+    with stage("page"):
+        run_case(analysis, sections)
+    with stage("sections"):
+        sections.finish()
+    if analysis.result() is None:
+        notice.warning("Too few departments match the selected filters for this analysis.")
+
+# Debug panel: wall time, CPU time, peak memory and cache hits of each stage
+# of this rerun. Records are also logged when $HAS_PROFILE_LOG is set.
+def show_profile(run):
+    with st.sidebar.expander("Profile of this run", expanded=True):
+        st.dataframe([
+            {
+                "Stage": "\u2003" * record["depth"] + record["stage"],
+                "Thread": record["thread"],
+                "Wall (ms)": round(record["wall_s"] * 1000, 1),
+                "CPU (ms)": round(record["cpu_s"] * 1000, 1),
+                "Peak (MB)": record.get("peak_mb"),
+                "Cache": record.get("cache", ""),
+            }
+            for record in run.finished()
+        ], hide_index=True)
+        if run.memory_busy:
+            st.caption("Peak memory is traced for one session at a time, and another session is tracing it.")
+        st.write("Cache lookups:", run.cache)
+
+def run_page(page):
+    debug = st.session_state.get("debug_panel", False)
+    if not (debug or profiling.LOG_PATH):
+        render_page(page)
+        return
+    with profiling.recording(memory=debug, page=page) as run:
+        render_page(page)
+    if debug:
+        show_profile(run)
 
 # Sidebar for navigation
 st.sidebar.title("🔎 Investigation Cases")
 case = st.sidebar.selectbox("Choose a case to investigate:", 
-                            ["Overview", "Case 1: Specialty Distribution", 
-                             "Case 2: Accreditation Trends"])
+                            ["Overview", *PAGES])
+st.sidebar.toggle("Debug panel", key="debug_panel",
+                  help="Profile each stage of the page: time, memory and cache hits")
 
 # Main content based on selected case
 if case == "Overview":
@@ -52,7 +153,7 @@ if case == "Overview":
         st.write("Explore this case to uncover insights about how medical specialties are distributed.")
     with case_1_col2:
         if st.button("🔍 Explore Case 1"):
-            run_case_1(data)
+            run_page("Case 1: Specialty Distribution")
     
     # Divider for better structure
     st.markdown("---")
@@ -72,15 +173,56 @@ if case == "Overview":
         st.write("Explore this case to understand accreditation trends over time.")
     with case_2_col2:
         if st.button("📈 Explore Case 2"):
-            run_case_2(data)
+            run_page("Case 2: Accreditation Trends")
+
+    st.markdown("---")
+
+    # Regions overview
+    st.subheader("🗺️ Regions and Departments")
+    st.write("Accreditations and accreditations per 100,000 inhabitants for France, each region and each department, from the national level down to a department's specialties.")
+    st.write("Choose **Regions and Departments** in the sidebar to drill down.")
+
+    st.markdown("---")
+
+    # Similarity overview
+    st.subheader("🧭 Similar Departments")
+    st.write("Find the departments whose specialty mix is closest to a given department, and the specialties that explain the difference.")
+    st.write("Choose **Similar Departments** in the sidebar to compare them.")
+
+    st.markdown("---")
+
+    # Establishments overview
+    st.subheader("🏨 Establishments and Teams")
+    st.write("Which establishments concentrate accredited teams, how large the teams are and which practitioners work across several establishments.")
+    st.write("Choose **Establishments and Teams** in the sidebar to explore them.")
+
+    st.markdown("---")
+
+    # Lookup overview
+    st.subheader("🔎 Practitioner and Team Lookup")
+    st.write(
+        """
+        Find a specific practitioner or team by name, RPPS or FINESS number, without exporting the data.
+        """)
+    st.write("Choose **Practitioner and Team Lookup** in the sidebar to search.")
+
+    st.markdown("---")
+
+    # Data quality overview
+    st.subheader("🧪 Data Quality")
+    st.write("Rows of the export with a missing or malformed RPPS number, an invalid accreditation date, an unknown department or a duplicate are quarantined when the data is loaded; unusual FINESS codes, specialties and accrediting bodies are flagged.")
+    st.write("Choose **Data Quality** in the sidebar to review them.")
+
+    st.markdown("---")
 
-elif case == "Case 1: Specialty Distribution":
-    # Directly run case 1
-    run_case_1(data)
+    # Downloads overview
+    st.subheader("📥 Downloads")
+    st.write("The specialty mapping, cluster membership, growth and decline tables and the accreditation rows as Parquet, CSV or JSON files, also served over HTTP by `python exports.py`.")
+    st.write("Choose **Downloads** in the sidebar to get them.")
 
-elif case == "Case 2: Accreditation Trends":
-    # Directly run case 2
-    run_case_2(data)
+else:
+    # Directly run the selected case
+    run_page(case)
 
 # Footer or sidebar notes
 st.sidebar.markdown("---")
@@ -1,64 +1,33 @@
-import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-
-
-# Load your dataset
-@st.cache_data
-def load_data():
-    data = pd.read_csv('medecin-accredites-has (2).csv')
-    return data
-
-data = load_data()
+import streamlit as st
+from charts import bar_chart, line_chart, scatter_chart
+from geography import URBAN_POPULATION, describe_departments
 
-# Case 1: Applying PCA to identify patterns in specialty distribution
-def run_case_1(data):
+# Case 1: Applying PCA to identify patterns in specialty distribution.
+# The numbers come from analytics.cluster_departments, this page only renders them.
+# `analysis` is a future of them: the narrative renders right away and the
+# sections that need the numbers are filled in by progressive.Sections.
+def run_case_1(analysis, sections):
     st.title("Case 1: Identifying Patterns in Specialty Distribution")
    
     st.subheader("Problematic: Are certain medical specialties concentrated in specific regions, while others are underserved?")
    
    # Encode specialties numerically
     st.write("We’ll assign a unique number to each specialty. This allows us to analyze the distribution of specialties more abstractly.")
-    le = LabelEncoder()
-    data['Specialty_Encoded'] = le.fit_transform(data['Spécialité'])
-   
-   # Display the mapping between original specialties and their encoded values
-    specialty_mapping = dict(zip(le.classes_, le.transform(le.classes_)))
-    st.write("Specialty encoding:", specialty_mapping)
-   
-    dept_specialty_encoded = data.groupby(['Département', 'Specialty_Encoded']).size().unstack(fill_value=0)
-   
-   # Standardize the data for PCA
-    scaler = StandardScaler()
-    dept_specialty_scaled = scaler.fit_transform(dept_specialty_encoded)
-   
-   # Apply PCA
-    pca = PCA(n_components=2)  # Reduce to 2 components for visualization
-    principal_components = pca.fit_transform(dept_specialty_scaled)
+   # Display the mapping between canonical specialties and their stable ids
+    sections.show(analysis, lambda analysis: st.write("Specialty encoding:", analysis.specialty_mapping))
    
-   # Create a DataFrame for the principal components
-    pca_df = pd.DataFrame(data=principal_components, columns=['PC1', 'PC2'], index=dept_specialty_encoded.index)
-   
-   # Apply KMeans clustering (with fixed random_state for consistency)
-    kmeans = KMeans(n_clusters=3, random_state=42)  # Set random_state for consistent clustering
-    pca_df['Cluster'] = kmeans.fit_predict(principal_components)
-   
-   # Assign consistent colors to clusters
+   # Assign consistent colors to clusters (on a copy, the projection is shared)
     cluster_colors = {0: 'blue', 1: 'gray', 2: 'red'}
-    pca_df['Color'] = pca_df['Cluster'].map(cluster_colors)
+    def pca_df(analysis):
+        return analysis.projection.assign(Color=analysis.projection['Cluster'].map(cluster_colors))
 
    # Visualize the first two principal components with consistent cluster colors
     st.subheader("PCA: Visualizing Departments in Terms of Specialties")
     st.write("Now that we've encoded the specialties numerically, we can apply Principal Component Analysis (PCA) to reduce the dimensionality of the data and uncover patterns or trends that might not be immediately visible.")
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.scatterplot(x='PC1', y='PC2', hue='Cluster', palette=cluster_colors, data=pca_df, ax=ax)
-    plt.title("PCA of Departments with Consistent Cluster Colors")
-    st.pyplot(fig)
+    sections.image(analysis, lambda analysis: scatter_chart(
+        pca_df(analysis), x='PC1', y='PC2', hue='Cluster', palette=cluster_colors,
+        title="PCA of Departments with Consistent Cluster Colors"))
      
     st.write("We have here highlighted different clusters using KMeans clustering.")
     st.write("As we can see we have 3 different clusters, let's try to understand this data distribution:")
@@ -68,61 +37,60 @@ def run_case_1(data):
     
    # Explained variance ratio
     st.subheader("Explained Variance by Each Principal Component")
-    explained_variance = pca.explained_variance_ratio_
-    st.write(f"PC1 explains {explained_variance[0]:.2f} of the variance")
-    st.write(f"PC2 explains {explained_variance[1]:.2f} of the variance")
+    def show_variance(analysis):
+        st.write(f"PC1 explains {analysis.explained_variance[0]:.2f} of the variance")
+        st.write(f"PC2 explains {analysis.explained_variance[1]:.2f} of the variance")
+    sections.show(analysis, show_variance)
     st.write("The majority of departments fall into Cluster 2, which suggests that they have relatively similar distributions of specialties. This large cluster centered around the origin indicates little variation between these departments in terms of the first two principal components.")
 
+   # Model selection: is 3 clusters a defensible choice?
+    st.subheader("How Many Clusters?")
+    st.write("To check the number of clusters, each candidate number of clusters (on 2 and 3 principal components) is scored by its silhouette (separation of the clusters), its inertia and its stability (agreement of the clusters across random seeds).")
+    def silhouette(analysis):
+        return analysis.model_selection.candidates.pivot(index='n_clusters', columns='n_components', values='silhouette')
+    # Not run for filtered subsets, which keep the choice made on the whole dataset
+    sections.image(analysis, lambda analysis: None if analysis.model_selection is None else line_chart(
+        silhouette(analysis), title="Silhouette by Number of Clusters", xlabel="Number of clusters",
+        ylabel="Silhouette", legend_title="Components"))
+    def show_selection(analysis):
+        selection = analysis.model_selection
+        if selection is None:
+            st.info("With filters, the clusters keep the number of clusters and components chosen for the whole dataset: the model selection is only run on it.")
+            return
+        st.write(selection.candidates)
+        st.write(f"Among the stable candidates, the best silhouette is reached with **{selection.n_clusters} clusters** on **{selection.n_components} principal components**.")
+    sections.show(analysis, show_selection)
+
 
    # Identify the outlier department in Cluster 2
-    outlier_department = pca_df[pca_df['Cluster'] == 2]
-    st.write("Outlier department in Cluster 2:")
-    st.write(outlier_department)
+    def show_outliers(analysis):
+        projection = pca_df(analysis)
+        st.write("Outlier department in Cluster 2:")
+        st.write(projection[projection['Cluster'] == 2])
+    sections.show(analysis, show_outliers)
    
 
    
-   # Function to plot the specialty distribution in Cluster 2
-    def plot_cluster_2_distribution(dept_specialty_encoded, pca_df):
-       # Filter the departments in Cluster 2
-        cluster_2_departments = pca_df[pca_df['Cluster'] == 2]
-       
-       # Get the specialty distribution for Cluster 2
-        cluster_2_specialty_dist = dept_specialty_encoded.loc[cluster_2_departments.index].sum()
-   
-       # Calculate the average specialty distribution for all other clusters (Cluster 0 and 1)
-        other_clusters_departments = pca_df[pca_df['Cluster'] != 2]
-        avg_other_clusters_dist = dept_specialty_encoded.loc[other_clusters_departments.index].mean()
-   
-      
-       # Plot comparison with average specialty distribution in other clusters
-        st.subheader("Comparison of Cluster 2 with Average Distribution in Other Clusters")
-        comparison_df = pd.DataFrame({
-           'Cluster 2': cluster_2_specialty_dist.values,
-           'Other Clusters (Average)': avg_other_clusters_dist.values
-       }, index=cluster_2_specialty_dist.index)
-   
-        fig, ax = plt.subplots(figsize=(10, 6))
-        comparison_df.plot(kind='bar', ax=ax)
-        plt.title("Cluster 2 vs. Average Specialty Distribution in Other Clusters")
-        plt.xlabel("Specialty (Encoded)")
-        plt.ylabel("Count")
-        st.pyplot(fig)
-   
-   # Call the function to plot Cluster 2 distribution
-    plot_cluster_2_distribution(dept_specialty_encoded, pca_df)
+   # Plot comparison of Cluster 2 with the average specialty distribution in other clusters (Cluster 0 and 1)
+    st.subheader("Comparison of Cluster 2 with Average Distribution in Other Clusters")
+    sections.image(analysis, lambda analysis: bar_chart(
+        analysis.focus_comparison, title="Cluster 2 vs. Average Specialty Distribution in Other Clusters",
+        xlabel="Specialty (Encoded)", ylabel="Count"))
      
-    # Ensure correct filtering of Cluster 2
-    cluster_2_departments = pca_df[pca_df['Cluster'] == 2].index
-    
-    # Check how many departments are actually in Cluster 2
-    st.write(f"Number of departments in Cluster 2: {len(cluster_2_departments)}")
-    
-    # Display only the departments in Cluster 2
-    if len(cluster_2_departments) > 0:
-        st.write("Departments in Cluster 2:")
-        st.write(cluster_2_departments.tolist())
-    else:
-        st.write("No departments found in Cluster 2.")
+    # Departments in Cluster 2
+    def show_cluster_2(analysis):
+        cluster_2_departments = analysis.cluster_members.get(2, [])
+        
+        # Check how many departments are actually in Cluster 2
+        st.write(f"Number of departments in Cluster 2: {len(cluster_2_departments)}")
+        
+        # Display only the departments in Cluster 2
+        if len(cluster_2_departments) > 0:
+            st.write("Departments in Cluster 2:")
+            st.write(cluster_2_departments)
+        else:
+            st.write("No departments found in Cluster 2.")
+    sections.show(analysis, show_cluster_2)
         
     st.header("Key Specialties in Cluster 2")
     
@@ -162,34 +130,18 @@ def run_case_1(data):
         
     st.title("Departments not in Cluster 2")
 
-    # List of departments
-    departments = [
-        "06",
-        "13",
-        "29",
-        "33",
-        "34",
-        "38",
-        "44",
-        "49",
-        "54",
-        "59",
-        "62",
-        "64",
-        "67",
-        "75",
-        "78",
-        "83",
-        "91",
-        "92",
-        "93",
-        "94"
-    ]
+    # Departments of the other clusters, described by the bundled reference table
+    def outside(analysis):
+        focus_members = set(analysis.cluster_members.get(analysis.focus_cluster, []))
+        return describe_departments(sorted(department for members in analysis.cluster_members.values()
+                                           for department in members if department not in focus_members))
     
     # Display the departments as a markdown list
     st.markdown("### Department Codes:")
-    for dept in departments:
-        st.markdown(f"- {dept}")
+    def show_outside(analysis):
+        for code, dept in outside(analysis).iterrows():
+            st.markdown(f"- {code}" if pd.isna(dept["Nom"]) else f"- {code} ({dept['Nom']}, {dept['Région']})")
+    sections.show(analysis, show_outside)
         
       
     st.subheader("Potential Urban Concentration")
@@ -197,27 +149,16 @@ def run_case_1(data):
   
     st.write("Some of the excluded departments include major urban centers like:")
     
-    
-    departments = [
-        {
-            "code": "13 (Bouches-du-Rhône)",
-            "description": "Contains the city of Marseille."
-        },
-        {
-            "code": "75 (Paris)",
-            "description": "The capital city of France, which would have a very distinct medical infrastructure."
-        },
-        {
-            "code": "92, 93, 94 (Hauts-de-Seine, Seine-Saint-Denis, and Val-de-Marne)",
-            "description": "Suburbs of Paris with distinct healthcare profiles."
-        }
-    ]
-    
-    # Display each department and its description
-    for dept in departments:
-        st.markdown(f"**{dept['code']}**")
-        st.write(dept["description"])
-        st.write("")  # Add a blank line for spacing
+    # The most populated of them, grouped by region
+    def show_urban(analysis):
+        departments = outside(analysis)
+        urban = departments[departments["Population"] >= URBAN_POPULATION].sort_values("Population", ascending=False)
+        for region, depts in urban.groupby("Région", sort=False):
+            st.markdown(f"**{', '.join(depts.index)} ({', '.join(depts['Nom'])})**")
+            st.write(f"{region}: around {depts['Population'].sum() / 1e6:.1f} million inhabitants, "
+                     f"chief town{'s' if len(depts) > 1 else ''} {', '.join(depts['Chef-lieu'])}.")
+            st.write("")  # Add a blank line for spacing
+    sections.show(analysis, show_urban)
     
     # Conclusion
     st.write(
@@ -227,41 +168,14 @@ def run_case_1(data):
     )
     
     
-        # Filter out the departments in Cluster 1
-    cluster_1_departments = pca_df[pca_df['Cluster'] == 1].index
-    
     # Display the departments in Cluster 1
     st.write("Departments in Cluster 1:")
-    st.write(cluster_1_departments.tolist())
-    
-    # Calculate the specialty distribution for Cluster 1
-    cluster_1_specialty_dist = dept_specialty_encoded.loc[cluster_1_departments].sum()
+    sections.show(analysis, lambda analysis: st.write(analysis.cluster_members.get(1, [])))
     
-    
-    
-    
-    # Filter out the departments in Cluster 0
-    cluster_0_departments = pca_df[pca_df['Cluster'] == 0].index
-    
-    # Calculate the specialty distribution for Cluster 0
-    cluster_0_specialty_dist = dept_specialty_encoded.loc[cluster_0_departments].sum()
-    cluster_2_specialty_dist = dept_specialty_encoded.loc[cluster_2_departments].sum()
-   
-    
-    # Compare Cluster 0 with Cluster 1 and Cluster 2
-    comparison_df = pd.DataFrame({
-        'Cluster 0': cluster_0_specialty_dist.values,
-        'Cluster 1': cluster_1_specialty_dist.values,
-        'Cluster 2': cluster_2_specialty_dist.values
-    }, index=cluster_0_specialty_dist.index)
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
-
-    comparison_df.plot(kind='bar', ax=ax, color=['blue', 'gray', 'red'])
-    plt.title("Cluster 0 vs. Cluster 1 vs. Cluster 2: Specialty Distribution Comparison")
-    plt.xlabel("Specialty (Encoded)")
-    plt.ylabel("Count")
-    st.pyplot(fig)
+    # Compare the specialty distributions of Cluster 0 with Cluster 1 and Cluster 2
+    sections.image(analysis, lambda analysis: bar_chart(
+        analysis.cluster_totals, title="Cluster 0 vs. Cluster 1 vs. Cluster 2: Specialty Distribution Comparison",
+        xlabel="Specialty (Encoded)", ylabel="Count", color=['blue', 'gray', 'red']))
     st.write("")
     
             
@@ -1,23 +1,15 @@
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-
+import functools
 
-# Load your dataset
-@st.cache_data
-def load_data():
-    data = pd.read_csv('medecin-accredites-has (2).csv')
-    return data
-
-data = load_data()
+import streamlit as st
+from charts import bar_chart, line_chart
+from progressive import show_chart
+from trends import trend_table
 
 
-def run_case_2(data):
+# The numbers come from analytics.accreditation_trends, this page only renders them.
+# `analysis` is a future of them: the narrative renders right away and the
+# sections that need the numbers are filled in by progressive.Sections.
+def run_case_2(analysis, sections):
    
     st.title("Case 2: Accreditation Trends Over Time ")
    
@@ -36,76 +28,39 @@ def run_case_2(data):
     **5. What might be the underlying causes of the observed trends (e.g., aging populations, technological advancements, public health priorities)?**
     """)
  
-    # Convert the 'Date accréditation' column to datetime format and extract the year
-    data['Date accréditation'] = pd.to_datetime(data['Date accréditation'], format='%d/%m/%Y', errors='coerce')
-    data['Year'] = data['Date accréditation'].dt.year
-    
-    # Group by year and specialty to count the number of accreditations per year for each specialty
-    accreditation_trends = data.groupby(['Year', 'Spécialité']).size().unstack(fill_value=0)
-    
-    # Plotting the accreditation trends over time
+    # Plotting the accreditation trends over time (number of accreditations per year for each specialty)
     st.title("Accreditation Trends Over Time by Specialty")
     st.subheader("First thing let us see our data : What are we dealing with ? ")
-    fig, ax = plt.subplots(figsize=(12, 6))
-    accreditation_trends.plot(kind='line', ax=ax)
-    plt.title('Accreditation Trends Over Time by Specialty')
-    plt.xlabel('Year')
-    plt.ylabel('Number of Accreditations')
-    plt.legend(title='Specialty', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    
-    # Display the plot in Streamlit
-    st.pyplot(fig)
+    sections.image(analysis, lambda analysis: line_chart(
+        analysis.trends, title='Accreditation Trends Over Time by Specialty',
+        xlabel='Year', ylabel='Number of Accreditations', legend_title='Specialty'))
    
-       # Calculate total accreditations per specialty across all years
-    total_accreditations = accreditation_trends.sum()
-    
-    # Separate into lowest and highest specialties based on total accreditations
-    lowest_accreditations = total_accreditations.nsmallest(5).index  # 5 lowest specialties
-    highest_accreditations = total_accreditations.nlargest(5).index  # 5 highest specialties
-    
-    # Filter the data for the lowest and highest accreditations
-    lowest_accreditation_trends = accreditation_trends[lowest_accreditations]
-    highest_accreditation_trends = accreditation_trends[highest_accreditations]
-    
-    # Get the maximum value for the y-axis from both datasets to use the same scale
-    y_max = max(lowest_accreditation_trends.max().max(), highest_accreditation_trends.max().max())
+    # The 5 highest and 5 lowest specialties based on total accreditations,
+    # with the maximum value of both for the y-axis to use the same scale
+    def y_max(analysis):
+        return max(analysis.trends[analysis.lowest].max().max(), analysis.trends[analysis.highest].max().max())
+
     # Plotting the highest accreditation trends
     st.title("Highest Accreditation Trends Over Time by Specialty")
     
-    fig, ax = plt.subplots(figsize=(12, 6))
-    highest_accreditation_trends.plot(kind='line', ax=ax)
-    plt.title('Highest Accreditation Trends Over Time by Specialty')
-    plt.xlabel('Year')
-    plt.ylabel('Number of Accreditations')
-    plt.ylim(0, y_max)  # Set the same y-axis limit
-    plt.legend(title='Specialty', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    st.pyplot(fig)
+    sections.image(analysis, lambda analysis: line_chart(
+        analysis.trends[analysis.highest], title='Highest Accreditation Trends Over Time by Specialty',
+        xlabel='Year', ylabel='Number of Accreditations', legend_title='Specialty',
+        ylim=(0, y_max(analysis))))  # Set the same y-axis limit
     # Plotting the lowest accreditation trends
     st.title("Lowest Accreditation Trends Over Time by Specialty")
     
-    fig, ax = plt.subplots(figsize=(12, 6))
-    lowest_accreditation_trends.plot(kind='line', ax=ax)
-    plt.title('Lowest Accreditation Trends Over Time by Specialty')
-    plt.xlabel('Year')
-    plt.ylabel('Number of Accreditations')
-    plt.ylim(0, y_max)  # Set the same y-axis limit
-    plt.legend(title='Specialty', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    st.pyplot(fig)
+    sections.image(analysis, lambda analysis: line_chart(
+        analysis.trends[analysis.lowest], title='Lowest Accreditation Trends Over Time by Specialty',
+        xlabel='Year', ylabel='Number of Accreditations', legend_title='Specialty',
+        ylim=(0, y_max(analysis))))  # Set the same y-axis limit
     
    
     st.subheader("Lets zoom in")
 
-    fig, ax = plt.subplots(figsize=(12, 6))
-    lowest_accreditation_trends.plot(kind='line', ax=ax)
-    plt.title('Lowest Accreditation Trends Over Time by Specialty')
-    plt.xlabel('Year')
-    plt.ylabel('Number of Accreditations')
-    plt.legend(title='Specialty', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    st.pyplot(fig)     
+    sections.image(analysis, lambda analysis: line_chart(
+        analysis.trends[analysis.lowest], title='Lowest Accreditation Trends Over Time by Specialty',
+        xlabel='Year', ylabel='Number of Accreditations', legend_title='Specialty'))
     
     
     st.write("What's important to notice here is that for all specialitise the schema is the same. In 2019 we have a strong augmentation of accreditation. ")
@@ -115,18 +70,11 @@ def run_case_2(data):
             
   
     
-    # Group the data by Year and Specialty to get total accreditations per year for each specialty
-    accreditation_growth = data.groupby(['Year', 'Spécialité']).size().unstack(fill_value=0)
-  
-         # Calculate the growth by subtracting the accreditations in 2020 from those in 2024
-    growth = accreditation_growth.loc[2024] - accreditation_growth.loc[2020]
-    
-    # Sort specialties by the most growth
-    most_growth_specialties = growth.sort_values(ascending=False)
-    
     # Display the top 5 specialties with the most growth
-    st.write("Specialties with the most growth from 2020 to 2024:")
-    st.write(most_growth_specialties.head())
+    def show_growth(analysis):
+        st.write(f"Specialties with the most growth from {analysis.start_year} to {analysis.end_year}:")
+        st.write(analysis.growth.head())
+    sections.show(analysis, show_growth)
       
     
         
@@ -147,51 +95,36 @@ def run_case_2(data):
     """)
      
     st.subheader(" Are there any specialties that are declining in terms of the number of accredited practitioners?")   
-           # Calculate the change by subtracting the accreditations in 2020 from those in 2024
-    growth = accreditation_growth.loc[2024] - accreditation_growth.loc[2020]
-    
-    # Filter out specialties where the number of accreditations has decreased (negative growth)
-    declining_specialties = growth[growth < 0].sort_values()
-    
-    # Create a DataFrame to store the decline and the peak year
-    declining_specialties_df = pd.DataFrame(declining_specialties, columns=['Decline'])
-    
-    # Find the year with the maximum accreditations for each declining specialty
-    declining_specialties_df['Peak Year'] = [accreditation_growth[specialty].idxmax() for specialty in declining_specialties.index]
-    
     # Display the specialties with the most decline and their peak year
-    st.write("Specialties with declining accreditations from 2020 to 2024 and their peak year:")
-    st.write(declining_specialties_df)
+    def show_declining(analysis):
+        st.write(f"Specialties with declining accreditations from {analysis.start_year} to {analysis.end_year} and their peak year:")
+        st.write(analysis.declining)
+    sections.show(analysis, show_declining)
     
     st.write("The thing that catches the eye here is that gynécologie specialisation is declining significantly fast. Maybe we coould look for reasons to that.")
     st.write("Let's see if departements hava something to do with it.")
         
-    # Convert 'Date accréditation' column to datetime and extract year
-    data['Date accréditation'] = pd.to_datetime(data['Date accréditation'], format='%d/%m/%Y', errors='coerce')
-    data['Year'] = data['Date accréditation'].dt.year
-    
-    # Filter the data to include only the specialty Gynécologie-obstétrique
-    gynecology_data = data[data['Spécialité'].str.contains('Gynécologie-obstétrique', na=False)]
-    
-    # Group the gynecology data by 'Year' and 'Département' to count the number of accreditations per department each year
-    gynecology_by_dept_year = gynecology_data.groupby(['Year', 'Département']).size().unstack(fill_value=0)
-    gynecology_decline = gynecology_by_dept_year.loc[2024] - gynecology_by_dept_year.loc[2020]
-    
-    # Sort departments by the most significant decline
-    gynecology_decline_sorted = gynecology_decline.sort_values(ascending=True)
-    
     # Display the departments with the most decline in gynecology accreditations
-    st.write("Departments with the most decline in Gynécologie-obstétrique accreditations from 2020 to 2024:")
-    st.write(gynecology_decline_sorted)
+    # (none when the filters leave out Gynécologie-obstétrique)
+    def show_gynecology(analysis):
+        if analysis.gynecology_decline.empty:
+            st.info("No Gynécologie-obstétrique accreditation matches the selected filters.")
+            return
+        st.write(f"Departments with the most decline in Gynécologie-obstétrique accreditations from {analysis.start_year} to {analysis.end_year}:")
+        st.write(analysis.gynecology_decline)
+    sections.show(analysis, show_gynecology)
   
-    fig, ax = plt.subplots(figsize=(10, 6))
-    gynecology_decline_sorted.plot(kind='bar', ax=ax)
-    plt.title('Decline in Gynécologie-obstétrique Accreditations by Department (2020-2024)')
-    plt.xlabel('Department')
-    plt.ylabel('Decline in Number of Accreditations')
-    st.pyplot(fig)
+    sections.image(analysis, lambda analysis: None if analysis.gynecology_decline.empty else bar_chart(
+        analysis.gynecology_decline,
+        title=f'Decline in Gynécologie-obstétrique Accreditations by Department ({analysis.start_year}-{analysis.end_year})',
+        xlabel='Department', ylabel='Decline in Number of Accreditations'))
     
     st.write("As we can see Gynécologie-obstétrique accreditations does appear to be regionally distributed, and there doesn’t seem to be an extreme or disproportionate drop in any single region, except for a few outliers.")
+
+    # Every specialty in every department at once, over a window chosen by the reader
+    st.title("Which Specialties Are Declining Where?")
+    st.write("The same comparison can be made for every specialty in every department. Choose the years to compare, and the number of years of the rolling mean that smooths yearly variations.")
+    sections.show(analysis, functools.partial(declining_where, native_charts=sections.native_charts))
     
     st.title("Overall Conclusion")
     
@@ -199,4 +132,30 @@ def run_case_2(data):
     The analysis reveals a clear impact of the COVID-19 pandemic on the accreditation trends of medical professionals, with critical care and diagnostics fields experiencing the most significant growth. On the other hand, **gynécologie-obstétrique** stands out as a specialty facing a notable decline, which may be the result of changing population needs and healthcare priorities.
     
     Further analysis could explore whether these trends continue post-pandemic or if other external factors, such as policy changes or technological advancements, will further alter the landscape of medical professional accreditations.
-    """)
\ No newline at end of file
+    """)
+
+
+# Its own fragment: changing the years, the rolling mean or the specialty
+# only reruns this section
+@st.fragment
+def declining_where(analysis, native_charts=False):
+    start_year, end_year = st.select_slider("Years to compare", options=analysis.tensor.years.tolist(),
+                                            value=(analysis.start_year, analysis.end_year))
+    rolling = st.slider("Rolling mean (years)", min_value=1, max_value=5, value=3)
+    departments = trend_table(analysis.tensor, start_year, end_year, rolling)
+
+    declining = departments[departments['Declining']].sort_values('Growth')
+    st.write(f"Specialty and department pairs with fewer accreditations in {end_year} than in {start_year} ({len(declining)} pairs):")
+    st.dataframe(declining)
+    if len(declining):
+        show_chart(bar_chart, declining.groupby(level='Spécialité').size().sort_values(ascending=False),
+                   title=f'Departments with a Decline by Specialty ({start_year}-{end_year})',
+                   xlabel='Specialty', ylabel='Number of Departments', native_charts=native_charts)
+
+    # Department by department view of one specialty
+    specialties = departments.index.unique('Spécialité').tolist()
+    specialty = st.selectbox("Specialty", specialties,
+                             index=specialties.index('Gynécologie-obstétrique') if 'Gynécologie-obstétrique' in specialties else 0)
+    change = departments.xs(specialty, level='Spécialité')['Growth'].sort_values()
+    show_chart(bar_chart, change, title=f'Change in {specialty} Accreditations by Department ({start_year}-{end_year})',
+               xlabel='Department', ylabel='Change in Number of Accreditations', native_charts=native_charts)
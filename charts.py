@@ -0,0 +1,174 @@
+import contextvars
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+from disk_cache import CACHE, cache_key
+from profiling import cache_event, stage
+
+
+# Charts are rendered to PNG bytes with standalone Figure objects: they are
+# never registered with pyplot, so nothing keeps them alive after rendering.
+# The bytes are cached per (chart kind, input table, options) and shared by
+# every rerun and session of the process, and through the disk cache by the
+# other processes of the host.
+MAX_CACHED_CHARTS = 128
+SAVEFIG_OPTIONS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+# Set by native(): the chart functions then return a NativeChart instead
+_native = contextvars.ContextVar('native_charts', default=False)
+
+
+@dataclass(frozen=True)
+class NativeChart:
+    # A Vega-Lite chart for st.vega_lite_chart, drawn by the browser: nothing
+    # is rendered on the server. The spec is a plain dict rather than an
+    # Altair chart, which takes a hundred times longer to build.
+    data: pd.DataFrame
+    spec: dict
+
+
+def native(chart, *args, **kwargs):
+    # chart(*args, **kwargs) as a NativeChart rather than PNG bytes
+    token = _native.set(True)
+    try:
+        return chart(*args, **kwargs)
+    finally:
+        _native.reset(token)
+
+
+def _long(frame, name):
+    # One row per index value and column, with the columns 'x', 'series'
+    # and 'y' the Vega-Lite specs encode
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame(name)
+    frame = frame.set_axis(frame.columns.map(str), axis=1)
+    return frame.rename_axis('x').reset_index().melt('x', var_name='series', value_name='y')
+
+
+def _native_chart(data, mark, title, x, y, **encoding):
+    spec = {'title': title, 'mark': {'type': mark, 'tooltip': True},
+            'encoding': {'x': x, 'y': y, **encoding}}
+    return NativeChart(data, spec)
+
+
+def _chart_key(kind, frame, options):
+    digest = hashlib.sha256(kind.encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    columns = frame.columns if isinstance(frame, pd.DataFrame) else [frame.name]
+    digest.update(repr(list(columns)).encode())
+    digest.update(repr(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+
+def _render(draw, figsize):
+    fig = Figure(figsize=figsize)
+    try:
+        with stage('draw'):
+            ax = fig.subplots()
+            draw(fig, ax)
+        with stage('rasterize'):
+            buffer = io.BytesIO()
+            fig.savefig(buffer, **SAVEFIG_OPTIONS)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def _cached(kind, frame, options, draw):
+    with stage(f'{kind}_chart'):
+        key = _chart_key(kind, frame, options)
+        with _lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                cache_event('charts', hit=True)
+                return _cache[key]
+
+        cache_event('charts', hit=False)
+        png = CACHE.get_or_compute(cache_key('charts', key, SAVEFIG_OPTIONS),
+                                   lambda: _render(draw, options.get('figsize', (10, 6))))
+
+        with _lock:
+            _cache[key] = png
+            while len(_cache) > MAX_CACHED_CHARTS:
+                _cache.popitem(last=False)
+        return png
+
+
+def clear_chart_cache():
+    with _lock:
+        _cache.clear()
+
+
+def line_chart(frame, title, xlabel, ylabel, legend_title=None, ylim=None, figsize=(12, 6)):
+    # One line per column, legend outside the axes
+    if _native.get():
+        y = {'field': 'y', 'type': 'quantitative', 'title': ylabel}
+        if ylim is not None:
+            y['scale'] = {'domain': [float(limit) for limit in ylim]}
+        return _native_chart(
+            _long(frame, ylabel), 'line', title, {'field': 'x', 'type': 'ordinal', 'title': xlabel}, y,
+            color={'field': 'series', 'type': 'nominal', 'title': legend_title})
+
+    def draw(fig, ax):
+        frame.plot(kind='line', ax=ax)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        if ylim is not None:
+            ax.set_ylim(*ylim)
+        ax.legend(title=legend_title, bbox_to_anchor=(1.05, 1), loc='upper left')
+        fig.tight_layout()
+
+    options = dict(title=title, xlabel=xlabel, ylabel=ylabel, legend_title=legend_title, ylim=ylim, figsize=figsize)
+    return _cached('line', frame, options, draw)
+
+
+def bar_chart(frame, title, xlabel, ylabel, color=None, figsize=(10, 6)):
+    if _native.get():
+        # Side by side bars per column, in the order of the index
+        encoding = {}
+        if isinstance(frame, pd.DataFrame) and len(frame.columns) > 1:
+            encoding = {'xOffset': {'field': 'series'},
+                        'color': {'field': 'series', 'type': 'nominal', 'title': None}}
+            if color is not None:
+                encoding['color']['scale'] = {'range': color}
+        return _native_chart(
+            _long(frame, ylabel), 'bar', title, {'field': 'x', 'type': 'nominal', 'sort': None, 'title': xlabel},
+            {'field': 'y', 'type': 'quantitative', 'title': ylabel}, **encoding)
+
+    def draw(fig, ax):
+        frame.plot(kind='bar', ax=ax, color=color)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+
+    options = dict(title=title, xlabel=xlabel, ylabel=ylabel, color=color, figsize=figsize)
+    return _cached('bar', frame, options, draw)
+
+
+def scatter_chart(frame, x, y, hue, palette, title, figsize=(10, 6)):
+    if _native.get():
+        # palette: colors by hue value, or the name of a color scheme
+        scale = {'domain': [str(value) for value in palette], 'range': list(palette.values())} \
+            if isinstance(palette, dict) else {'scheme': palette}
+        data = frame[[x, y]].assign(**{hue: frame[hue].astype(str)})
+        return _native_chart(
+            data, 'point', title, {'field': x, 'type': 'quantitative'}, {'field': y, 'type': 'quantitative'},
+            color={'field': hue, 'type': 'nominal', 'scale': scale})
+
+    def draw(fig, ax):
+        # seaborn is only needed here, keep it out of the import of this module
+        import seaborn as sns
+        sns.scatterplot(x=x, y=y, hue=hue, palette=palette, data=frame, ax=ax)
+        ax.set_title(title)
+
+    options = dict(x=x, y=y, hue=hue, palette=palette, title=title, figsize=figsize)
+    return _cached('scatter', frame, options, draw)
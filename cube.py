@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Dimensions of the count cube, in storage order
+AXES = ['Year', 'Département', 'Spécialité', 'Statut', 'OA']
+
+
+@dataclass
+class CountCube:
+    # Dense count array with one categorical axis per dimension. Every axis
+    # has one extra trailing slot for missing values, so that marginal sums
+    # still include rows with e.g. no department, like a groupby over the
+    # other keys would.
+    labels: dict          # axis name -> pd.Index of categories
+    counts: np.ndarray
+
+    def axis(self, name):
+        return AXES.index(name)
+
+    def table(self, index, columns=None, where=None):
+        # Slice on the `where` selection ({axis: label or list of labels}),
+        # sum out every other axis and return an index x columns table.
+        # Empty rows and columns are dropped, matching groupby(...).size().
+        counts = self.counts
+        labels = dict(self.labels)
+        for name, value in (where or {}).items():
+            positions = self.labels[name].get_indexer(np.atleast_1d(value))
+            positions = positions[positions >= 0]
+            counts = np.take(counts, positions, axis=self.axis(name))
+            labels[name] = self.labels[name][positions]
+
+        kept = [index] if columns is None else [index, columns]
+        summed = tuple(i for i, name in enumerate(AXES) if name not in kept)
+        counts = counts.sum(axis=summed)
+        if columns is not None and self.axis(index) > self.axis(columns):
+            counts = counts.T
+
+        # Drop the missing slot of the kept axes (selected axes no longer have one)
+        counts = counts[tuple(slice(0, len(labels[name])) for name in kept)]
+        if columns is None:
+            series = pd.Series(counts, index=labels[index].rename(index))
+            return series[series > 0]
+        table = pd.DataFrame(counts, index=labels[index].rename(index), columns=labels[columns].rename(columns))
+        return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+
+    def combine(self, other, sign=1):
+        # self + sign * other on the union of both cubes' labels. Used to apply
+        # the delta of a new export without recounting every row.
+        labels = {}
+        for name in AXES:
+            extra = other.labels[name].difference(self.labels[name])
+            labels[name] = self.labels[name].append(extra) if len(extra) else self.labels[name]
+            # Specialty positions are the stable token ids, the other axes stay sorted
+            if name != 'Spécialité' and len(extra):
+                labels[name] = labels[name].sort_values()
+        counts = np.zeros(tuple(len(labels[name]) + 1 for name in AXES), dtype=np.int32)
+        for cube, factor in ((self, 1), (other, sign)):
+            # Position of each of the cube's slots (missing slot last) in the union
+            positions = [
+                np.append(labels[name].get_indexer(cube.labels[name]), len(labels[name]))
+                for name in AXES
+            ]
+            counts[np.ix_(*positions)] += factor * cube.counts
+        return CountCube(labels=labels, counts=counts)
+
+
+def axis_codes(frame, specialties):
+    # Integer code and categories of each row on every axis, -1 when missing
+    years = pd.Categorical(frame['Date accréditation'].dt.year)
+    codes = {
+        'Year': (years.codes, pd.Index(years.categories)),
+        'Spécialité': (specialties.primary, pd.Index(specialties.tokens)),
+    }
+    for name in ['Département', 'Statut', 'OA']:
+        values = frame[name].astype('category')
+        # Snapshots written chunk by chunk list categories in order of appearance
+        values = values.cat.reorder_categories(sorted(values.cat.categories))
+        codes[name] = (values.cat.codes.to_numpy(), pd.Index(values.cat.categories))
+    return codes
+
+
+def cell_index(frame, specialties):
+    # Cube labels and shape, and the flattened cell index of every row
+    codes = axis_codes(frame, specialties)
+    labels = {name: codes[name][1] for name in AXES}
+    shape = tuple(len(labels[name]) + 1 for name in AXES)
+    # Missing codes (-1) point to the trailing slot of their axis
+    cells = np.ravel_multi_index(
+        tuple(np.where(codes[name][0] < 0, len(labels[name]), codes[name][0]) for name in AXES), shape)
+    return labels, shape, cells
+
+
+def count_cells(labels, shape, cells):
+    # One bincount over the cell index of the counted rows
+    counts = np.bincount(cells, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+    return CountCube(labels=labels, counts=counts)
+
+
+def build_cube(frame, specialties):
+    return count_cells(*cell_index(frame, specialties))
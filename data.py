@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cube import CountCube, build_cube
+from disk_cache import CACHE, cache_key
+from filters import FilterIndex, build_filter_index
+from profiling import stage
+from specialties import SpecialtyIndex, build_specialty_index
+from validation import QualityReport, Validator
+
+
+# Location of the HAS export and of the columnar snapshots derived from it
+CSV_PATH = Path(__file__).with_name('medecin-accredites-has (2).csv')
+SNAPSHOT_DIR = Path(__file__).with_name('.snapshots')
+# Part of the snapshot names: bumped when the rows kept from a CSV change
+# (version 2: validated rows only)
+SNAPSHOT_VERSION = 2
+
+DATE_FORMAT = '%d/%m/%Y'
+# Rows per chunk when a file is read or written incrementally
+CHUNK_ROWS = 500_000
+
+# The dataset is shared read-only by every session. With copy-on-write any
+# column or frame derived from it is a lazy copy, so an analysis can never
+# write back into the shared frame (always on from pandas 3).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Explicit schema: everything is read as text first so that codes such as
+# "2A" or "01" keep their meaning, then converted column by column.
+#  - low-cardinality columns become categoricals
+#  - RPPS numbers (11 digits) become int64 ids instead of Python strings
+#  - FINESS numbers are alphanumeric ("2A0000139", "GCS591") so they are
+#    dictionary encoded rather than parsed as integers
+CATEGORY_COLUMNS = ['Spécialité', 'OA', 'Nom équipe', 'Département', 'FINESS', 'Statut']
+STRING_COLUMNS = ['Nom', 'Prénom']
+ID_COLUMN = 'N° RPPS'
+DATE_COLUMN = 'Date accréditation'
+COLUMNS = [ID_COLUMN, 'Nom', 'Prénom', 'Spécialité', DATE_COLUMN, 'OA',
+           'Nom équipe', 'Département', 'FINESS', 'Statut']
+
+
+def apply_schema(raw, validator=None):
+    # Convert a frame of raw text columns to the typed schema, keeping only
+    # the rows that pass the validator's checks when there is one
+    data = pd.DataFrame(index=raw.index)
+    for column in COLUMNS:
+        values = raw[column]
+        if column == ID_COLUMN:
+            data[column] = pd.to_numeric(values, errors='coerce').astype('Int64')
+        elif column == DATE_COLUMN:
+            data[column] = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+        elif column in CATEGORY_COLUMNS:
+            data[column] = values.str.strip().astype('category')
+        else:
+            data[column] = values.astype('string')
+    if validator is not None:
+        data = validator.check(raw, data)
+    return data
+
+
+def read_csv(path=CSV_PATH, validator=None):
+    raw = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''])
+    return apply_schema(raw, validator)
+
+
+def iter_csv(path=CSV_PATH, chunk_rows=CHUNK_ROWS, validator=None):
+    # Typed chunks of at most chunk_rows rows, indexed by their row number in the file
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''], chunksize=chunk_rows)
+    for raw in reader:
+        yield apply_schema(raw, validator)
+
+
+def tmp_path_for(path):
+    # Temporary name of a file being written, unique per process and thread
+    # so that concurrent writers of the same file (replicas cold-starting at
+    # once, an ingest during a cold start) never share it; the last rename wins
+    return path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+
+class SnapshotWriter:
+    # Writes a typed frame to one Parquet file chunk by chunk. Dictionary
+    # (categorical) columns get int32 indices so every chunk has the same
+    # schema whatever its number of categories. The file only appears under
+    # its final name once closed.
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tmp_path = tmp_path_for(self.path)
+        self.schema = None
+        self.writer = None
+
+    def write(self, chunk):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.writer is None:
+            self.schema = pa.schema(
+                [field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                 if pa.types.is_dictionary(field.type) else field for field in table.schema],
+                metadata=table.schema.metadata,
+            )
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        elif self.writer is not None:
+            self.writer.close()
+            self.tmp_path.unlink(missing_ok=True)
+
+
+def file_fingerprint(path=CSV_PATH):
+    # The snapshot is keyed on size, mtime and content hash. Hashing is only
+    # redone when size or mtime differ from the last recorded values.
+    path = Path(path)
+    stat = path.stat()
+    SNAPSHOT_DIR.mkdir(exist_ok=True)
+    index_path = SNAPSHOT_DIR / 'index.json'
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(str(path.resolve()))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    index[str(path.resolve())] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    tmp_path = tmp_path_for(index_path)
+    tmp_path.write_text(json.dumps(index, indent=2))
+    os.replace(tmp_path, index_path)
+    return sha256
+
+
+def snapshot_path(fingerprint):
+    return SNAPSHOT_DIR / f'{fingerprint[:16]}.v{SNAPSHOT_VERSION}.parquet'
+
+
+def derived_path(fingerprint, name):
+    return SNAPSHOT_DIR / f'{fingerprint[:16]}.v{SNAPSHOT_VERSION}.{name}.pkl'
+
+
+def write_snapshot(data, fingerprint):
+    snapshot = snapshot_path(fingerprint)
+    snapshot.parent.mkdir(exist_ok=True)
+    tmp_path = tmp_path_for(snapshot)
+    try:
+        data.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, snapshot)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_derived(value, fingerprint, name):
+    # Structure derived from a dataset version ('cube', 'specialties'), e.g.
+    # maintained by ingest.py, that load_dataset() reuses instead of rebuilding
+    path = derived_path(fingerprint, name)
+    path.parent.mkdir(exist_ok=True)
+    tmp_path = tmp_path_for(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_derived(fingerprint, name):
+    path = derived_path(fingerprint, name)
+    if not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_or_build(dataset, name, build):
+    # Derived structure of a dataset version: built from its rows by
+    # build(frame) the first time, then read from next to its snapshot
+    value = read_derived(dataset.fingerprint, name)
+    if value is None:
+        value = build(dataset.frame)
+        write_derived(value, dataset.fingerprint, name)
+    return value
+
+
+def load_data(path=CSV_PATH, fingerprint=None):
+    # Warm start: memory-map the Parquet snapshot of this exact CSV version.
+    # Cold start: parse and validate the CSV once and write the snapshot and
+    # the quality report for next time.
+    fingerprint = fingerprint or file_fingerprint(path)
+    snapshot = snapshot_path(fingerprint)
+    if snapshot.exists():
+        # Columns are converted one at a time and their Arrow buffers released
+        # as they go, so the snapshot and the frame are never both in memory
+        with stage('snapshot_read'):
+            table = pq.read_table(snapshot, memory_map=True)
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    validator = Validator()
+    with stage('csv_parse'):
+        data = read_csv(path, validator)
+    with stage('snapshot_write'):
+        write_snapshot(data, fingerprint)
+        write_derived(validator.report(), fingerprint, 'quality')
+    return data
+
+
+@dataclass(frozen=True)
+class Dataset:
+    # The typed frame plus the structures derived from it once per version.
+    # One instance is shared by every session of the process: analyses derive
+    # new tables from it and never assign into it.
+    frame: pd.DataFrame
+    fingerprint: str
+    specialties: SpecialtyIndex
+    cube: CountCube
+    filters: FilterIndex
+    quality: QualityReport    # checks of the rows and the rows quarantined from the CSV
+
+
+def load_dataset(path=CSV_PATH):
+    with stage('fingerprint'):
+        fingerprint = file_fingerprint(path)
+    with stage('load_data'):
+        frame = load_data(path, fingerprint)
+    # Reuse the structures maintained by ingestion when there are some, or
+    # those built by another process for the same version
+    with stage('specialty_index'):
+        specialties = read_derived(fingerprint, 'specialties')
+        if specialties is None:
+            specialties = CACHE.get_or_compute(cache_key('specialties', SNAPSHOT_VERSION, fingerprint),
+                                               lambda: build_specialty_index(frame['Spécialité']))
+    with stage('cube'):
+        cube = read_derived(fingerprint, 'cube')
+        if cube is None:
+            cube = CACHE.get_or_compute(cache_key('cube', SNAPSHOT_VERSION, fingerprint),
+                                        lambda: build_cube(frame, specialties))
+    with stage('filter_index'):
+        filters = CACHE.get_or_compute(cache_key('filters', SNAPSHOT_VERSION, fingerprint),
+                                       lambda: build_filter_index(frame, specialties))
+    dataset = Dataset(
+        frame=frame,
+        fingerprint=fingerprint,
+        specialties=specialties,
+        cube=cube,
+        filters=filters,
+        quality=read_derived(fingerprint, 'quality'),
+    )
+    freeze(dataset)
+    return dataset
+
+
+def freeze(dataset):
+    # Make the derived arrays read-only so that an in-place write raises
+    # instead of silently changing what other sessions see
+    specialties, filters = dataset.specialties, dataset.filters
+    arrays = [
+        dataset.cube.counts,
+        specialties.primary,
+        specialties.matrix.data,
+        specialties.matrix.indices,
+        specialties.matrix.indptr,
+        *specialties.postings.values(),
+        *(bitmap for bitmaps in filters.bitmaps.values() for bitmap in bitmaps.values()),
+        filters.date_order,
+        filters.dates,
+        filters.cells,
+    ]
+    for array in arrays:
+        array.flags.writeable = False
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from profiling import cache_event
+
+
+# On-disk cache shared by every Streamlit process of the host, so that a
+# restarted or new replica reads what another one already computed instead
+# of recomputing it. Entries are content addressed: the key is a hash of the
+# function name, the dataset version or input hash, and the parameters.
+#  - writes go to a temporary file renamed into place, so readers never see
+#    a partial entry
+#  - reads touch the entry's mtime, and once the directory grows past
+#    MAX_CACHE_BYTES the least recently used entries are deleted
+#  - entries older than CACHE_TTL seconds are treated as missing
+# $HAS_CACHE_DIR moves the cache; an empty value disables it.
+CACHE_DIR = os.environ.get('HAS_CACHE_DIR', str(Path(__file__).with_name('.cache')))
+MAX_CACHE_BYTES = 1 << 30
+CACHE_TTL = 7 * 24 * 3600
+# Temporary files left by an interrupted writer are removed after this long
+STALE_TMP_SECONDS = 3600
+
+
+def cache_key(*parts):
+    # Parts are names, hashes, numbers, tuples and dataclasses of those, whose
+    # repr is stable across processes
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, ttl=CACHE_TTL):
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def path(self, key):
+        return self.directory / f'{key}.pkl'
+
+    def get(self, key):
+        # (True, value) on a hit, (False, None) otherwise
+        if self.directory is None:
+            return False, None
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                created = pickle.load(f)
+                expired = self.ttl is not None and time.time() - created > self.ttl
+                value = None if expired else pickle.load(f)
+        except FileNotFoundError:
+            cache_event('disk', hit=False)
+            return False, None
+        except Exception:
+            # Unreadable entry (e.g. pickled by an incompatible version)
+            expired = True
+        if expired:
+            path.unlink(missing_ok=True)
+            cache_event('disk', hit=False)
+            return False, None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        cache_event('disk', hit=True)
+        return True, value
+
+    def set(self, key, value):
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        # Creation time first, so that an expired entry is detected without
+        # unpickling its value
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(time.time(), f)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        hit, value = self.get(key)
+        if not hit:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def evict(self):
+        # Delete the least recently used entries until the cache fits
+        entries, total = [], 0
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith('.tmp'):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    Path(entry.path).unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Another process may have deleted it already
+            Path(path).unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        if self.directory is not None and self.directory.exists():
+            for entry in os.scandir(self.directory):
+                Path(entry.path).unlink(missing_ok=True)
+
+
+CACHE = DiskCache()
+
+
+def clear():
+    # Delete every entry of the shared cache
+    CACHE.clear()
@@ -0,0 +1,47 @@
+import os
+
+import streamlit as st
+
+from exports import CHUNK_ROWS, FORMATS, TABLES, export_path, export_version, table_rows
+from resources import get_results
+
+# Tables of more rows than this are not held in memory by a download button:
+# they link to the export server (python exports.py), which streams their
+# file. $HAS_EXPORTS_URL is the address the browser reaches it at.
+MAX_BUTTON_ROWS = CHUNK_ROWS
+EXPORTS_URL = os.environ.get("HAS_EXPORTS_URL", "http://127.0.0.1:8502")
+
+
+# Serialized bytes of a table, shared by every session and every download of
+# this dataset version. Called when the button is clicked, not on every rerun
+# of the page.
+@st.cache_resource(max_entries=64)
+def get_export_bytes(version, name, fmt, _results):
+    return export_path(_results, name, fmt).read_bytes()
+
+# Download buttons for the result tables of both cases and the dataset rows.
+# The tables are those of the whole dataset: the sidebar filters do not apply.
+def run_downloads():
+    st.title("📥 Downloads")
+    st.write("Download the tables behind the cases instead of copying them from the pages. Each table is serialized once per version of the data, so repeated downloads are immediate.")
+    st.write(f"The same files are served over HTTP by `python exports.py`, e.g. `{EXPORTS_URL}/gynecology_decline.csv`. Tables of more than {MAX_BUTTON_ROWS:,} rows are downloaded from it.")
+
+    results = get_results()
+    version = export_version(results)
+    fmt = st.radio("Format", list(FORMATS), horizontal=True, format_func=str.upper)
+    for name, (description, table) in TABLES.items():
+        if table is not None and table(results) is None:
+            continue
+        col1, col2 = st.columns([3, 1])
+        col1.write(f"**{name}**: {description}")
+        if table_rows(name, results) > MAX_BUTTON_ROWS:
+            col2.link_button(f"⬇️ {name}.{fmt}", f"{EXPORTS_URL}/{name}.{fmt}")
+            continue
+        col2.download_button(
+            f"⬇️ {name}.{fmt}",
+            data=lambda name=name: get_export_bytes(version, name, fmt, results),
+            file_name=f"{name}.{fmt}",
+            mime=FORMATS[fmt],
+            on_click="ignore",
+            key=f"download_{name}",
+        )
@@ -0,0 +1,262 @@
+"""Serve the result tables of the current HAS export as Parquet, CSV or JSON.
+
+Every table (Case 1 specialty mapping and cluster membership, Case 2 growth
+and decline tables, the accreditation rows...) is serialized once per
+dataset version and format, into a file under .exports/, by streaming it in
+chunks of CHUNK_ROWS rows. Later downloads send that file as it is, from the
+app's download buttons or from this small local HTTP endpoint:
+
+    GET /                         JSON index of the tables and their URLs
+    GET /<table>.<parquet|csv|json>
+
+    python exports.py [--csv PATH] [--host HOST] [--port PORT]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics import RESULTS_VERSION, cached_results, load_results
+from data import CSV_PATH, SNAPSHOT_VERSION, file_fingerprint, load_data, load_dataset, snapshot_path, tmp_path_for
+
+
+EXPORT_DIR = Path(__file__).with_name('.exports')
+# Bumped when the layout of the exported tables changes
+EXPORT_VERSION = 1
+CHUNK_ROWS = 100_000
+FORMATS = {
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+
+def _series(values, index, name):
+    return values.rename_axis(index).rename(name).to_frame()
+
+
+# name: (description, table of a Results, None when the results lack it).
+# The accreditation rows are read from the dataset snapshot instead, see
+# iter_table.
+TABLES = {
+    'specialty_mapping': (
+        'Case 1: id of each specialty in the department tables',
+        lambda results: results.clusters and _series(
+            pd.Series(results.clusters.specialty_mapping), 'Spécialité', 'Specialty_Encoded')),
+    'department_specialties': (
+        'Case 1: accreditations per department and specialty id',
+        lambda results: results.clusters and results.clusters.dept_specialty),
+    'cluster_membership': (
+        'Case 1: cluster and principal components of each department',
+        lambda results: results.clusters and results.clusters.projection),
+    'cluster_totals': (
+        'Case 1: accreditations per specialty id and cluster',
+        lambda results: results.clusters and results.clusters.cluster_totals),
+    'yearly_trends': (
+        'Case 2: accreditations per year and specialty',
+        lambda results: results.trends.trends),
+    'specialty_growth': (
+        'Case 2: change in accreditations per specialty between the start and end years',
+        lambda results: _series(results.trends.growth, 'Spécialité', 'Growth')),
+    'declining_specialties': (
+        'Case 2: decline and peak year of the declining specialties',
+        lambda results: results.trends.declining),
+    'gynecology_decline': (
+        'Case 2: change in gynecology-obstetrics accreditations per department',
+        lambda results: _series(results.trends.gynecology_decline, 'Département', 'Change')),
+    'department_trends': (
+        'Case 2: trend metrics of every specialty in every department',
+        lambda results: results.trends.departments),
+    'accreditations': (
+        'Every accreditation row of the dataset',
+        None),
+}
+
+
+def _prepare(frame):
+    # Index levels become columns, and column labels strings (Parquet
+    # requires them, and CSV and JSON read back the same way)
+    frame = frame.reset_index()
+    frame.columns = frame.columns.map(str)
+    return frame
+
+
+def iter_table(name, results, path=CSV_PATH):
+    # Chunks of at most CHUNK_ROWS rows of a table, at least one (possibly
+    # empty) so that every format gets its header or schema
+    if name == 'accreditations':
+        snapshot = snapshot_path(results.fingerprint)
+        if not snapshot.exists():
+            load_data(path, results.fingerprint)
+        for batch in pq.ParquetFile(snapshot).iter_batches(batch_size=CHUNK_ROWS):
+            yield batch.to_pandas()
+        return
+    table = TABLES[name][1](results)
+    if table is None:
+        raise LookupError(f'{name} is not available for this dataset')
+    frame = _prepare(table)
+    for start in range(0, max(len(frame), 1), CHUNK_ROWS):
+        yield frame.iloc[start:start + CHUNK_ROWS]
+
+
+def table_rows(name, results, path=CSV_PATH):
+    # Number of rows of a table, without serializing it
+    if name == 'accreditations':
+        snapshot = snapshot_path(results.fingerprint)
+        if not snapshot.exists():
+            load_data(path, results.fingerprint)
+        return pq.ParquetFile(snapshot).metadata.num_rows
+    return len(TABLES[name][1](results))
+
+
+def write_table(chunks, fmt, out):
+    # Serialize the chunks into the binary file `out` one at a time, so that
+    # only one chunk is ever held as text
+    if fmt == 'csv':
+        for i, chunk in enumerate(chunks):
+            out.write(chunk.to_csv(index=False, header=i == 0).encode('utf-8'))
+    elif fmt == 'json':
+        # One array of records, the records of each chunk appended to it
+        out.write(b'[')
+        first = True
+        for chunk in chunks:
+            records = chunk.to_json(orient='records', date_format='iso', force_ascii=False)[1:-1]
+            if records:
+                out.write((records if first else ',' + records).encode('utf-8'))
+                first = False
+        out.write(b']')
+    elif fmt == 'parquet':
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, schema=writer and writer.schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+        writer.close()
+    else:
+        raise ValueError(f'unknown format {fmt!r}, expected one of {list(FORMATS)}')
+
+
+def export_version(results):
+    # The files depend on the dataset version, on how its rows were kept
+    # (snapshot), on how the results were computed and on the export layout
+    return f'{results.fingerprint[:16]}-s{SNAPSHOT_VERSION}-r{RESULTS_VERSION}-e{EXPORT_VERSION}'
+
+
+def export_path(results, name, fmt, path=CSV_PATH):
+    # File of the serialized table for this dataset version, written on the
+    # first request and reused by every later one
+    if name not in TABLES:
+        raise KeyError(name)
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown format {fmt!r}, expected one of {list(FORMATS)}')
+    export = EXPORT_DIR / export_version(results) / f'{name}.{fmt}'
+    if export.exists():
+        return export
+    export.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_path_for(export)
+    try:
+        with open(tmp_path, 'wb') as out:
+            write_table(iter_table(name, results, path), fmt, out)
+        os.replace(tmp_path, export)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return export
+
+
+class ExportServer(ThreadingHTTPServer):
+    # Serves the tables of the current version of the CSV at `csv_path`: a new
+    # version is picked up on the next request after the file is replaced
+    def __init__(self, address, csv_path=CSV_PATH):
+        super().__init__(address, ExportHandler)
+        self.csv_path = csv_path
+        self._results = None
+        self._lock = threading.Lock()
+
+    def results(self):
+        fingerprint = file_fingerprint(self.csv_path)
+        with self._lock:
+            if self._results is None or self._results.fingerprint != fingerprint:
+                self._results = load_results(fingerprint) or \
+                    cached_results(fingerprint, lambda: load_dataset(self.csv_path))
+            return self._results
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        results = self.server.results()
+        name, _, fmt = self.path.strip('/').partition('.')
+        if not name:
+            self._send_index(results)
+            return
+        if name not in TABLES or fmt not in FORMATS:
+            self.send_error(HTTPStatus.NOT_FOUND, f'expected /<table>.<{"|".join(FORMATS)}>, see /')
+            return
+
+        # The serialized files never change for a version: clients holding
+        # the current one are told so without a body
+        etag = f'"{export_version(results)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        try:
+            export = export_path(results, name, fmt, self.server.csv_path)
+        except LookupError as error:
+            self.send_error(HTTPStatus.NOT_FOUND, str(error))
+            return
+        with open(export, 'rb') as f:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', FORMATS[fmt])
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{name}.{fmt}"')
+            self.send_header('ETag', etag)
+            self.end_headers()
+            # Straight from the file to the socket, without reading it into memory
+            self.connection.sendfile(f)
+
+    def _send_index(self, results):
+        index = {
+            'fingerprint': results.fingerprint,
+            'tables': {
+                name: {'description': description, 'urls': [f'/{name}.{fmt}' for fmt in FORMATS]}
+                for name, (description, _) in TABLES.items()
+            },
+        }
+        body = json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', FORMATS['json'])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', type=Path, default=CSV_PATH, help='HAS accreditation export')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8502, help='port to listen on')
+    args = parser.parse_args(argv)
+
+    server = ExportServer((args.host, args.port), args.csv)
+    print(f'Serving the tables of {args.csv} on http://{args.host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cube import cell_index, count_cells
+
+
+# Sidebar filters. Each filterable value has a bitmap of its rows (one bit per
+# row, packed 8 rows per byte) built once when the dataset is loaded, so that
+# applying a selection is an OR of the bitmaps of the selected values within a
+# column, an AND across columns, and a bincount of the matching rows into the
+# count cube, without scanning the frame on every rerun.
+FILTER_COLUMNS = ['Département', 'Spécialité', 'OA', 'Statut']
+
+
+@dataclass(frozen=True)
+class Selection:
+    # Values kept per column (empty: no constraint) and an inclusive range of
+    # accreditation dates (None: every row, including rows without a date)
+    departments: tuple = ()
+    specialties: tuple = ()
+    oa: tuple = ()
+    statut: tuple = ()
+    dates: tuple = None       # (datetime.date, datetime.date)
+
+    def constraints(self):
+        values = (self.departments, self.specialties, self.oa, self.statut)
+        return {column: selected for column, selected in zip(FILTER_COLUMNS, values) if selected}
+
+    @property
+    def active(self):
+        return bool(self.constraints()) or self.dates is not None
+
+
+@dataclass
+class FilterIndex:
+    n_rows: int
+    bitmaps: dict             # column -> {value: packed bitmap of its rows}
+    date_order: np.ndarray    # ids of the rows with a date, by increasing date
+    dates: np.ndarray         # the dates of those rows, sorted
+    cube_labels: dict         # axes of the count cube and the cell of each row in it
+    cube_shape: tuple
+    cells: np.ndarray
+
+    def options(self, column):
+        return list(self.bitmaps[column])
+
+    def date_bounds(self):
+        return pd.Timestamp(self.dates[0]).date(), pd.Timestamp(self.dates[-1]).date()
+
+    def bitmap(self, selection):
+        result = np.full((self.n_rows + 7) // 8, 0xFF, dtype=np.uint8)
+        for column, selected in selection.constraints().items():
+            bitmaps = [self.bitmaps[column][value] for value in selected if value in self.bitmaps[column]]
+            result &= np.bitwise_or.reduce(bitmaps) if bitmaps else 0
+        if selection.dates is not None:
+            start, end = (np.datetime64(date, 'D') for date in selection.dates)
+            first, last = np.searchsorted(self.dates, [start, end + np.timedelta64(1, 'D')])
+            in_range = np.zeros(self.n_rows, dtype=bool)
+            in_range[self.date_order[first:last]] = True
+            result &= np.packbits(in_range)
+        return result
+
+    def rows(self, selection):
+        return np.flatnonzero(np.unpackbits(self.bitmap(selection), count=self.n_rows))
+
+    def count(self, selection):
+        return int(np.unpackbits(self.bitmap(selection), count=self.n_rows).sum())
+
+    def cube(self, selection):
+        # Count cube of the selected rows only
+        return count_cells(self.cube_labels, self.cube_shape, self.cells[self.rows(selection)])
+
+
+def build_filter_index(frame, specialties):
+    bitmaps = {}
+    for column in ['Département', 'OA', 'Statut']:
+        values = frame[column].astype('category')
+        codes = values.cat.codes.to_numpy()
+        bitmaps[column] = {
+            value: np.packbits(codes == values.cat.categories.get_loc(value))
+            for value in sorted(values.cat.categories)
+        }
+    # Any token of the field, so that secondary activities can be selected too
+    bitmaps['Spécialité'] = {
+        token: np.packbits(specialties.mask(token))
+        for token in specialties.tokens if token in specialties.postings
+    }
+
+    dates = frame['Date accréditation'].to_numpy()
+    dated = np.flatnonzero(~np.isnat(dates))
+    order = dated[np.argsort(dates[dated], kind='stable')]
+
+    labels, shape, cells = cell_index(frame, specialties)
+    return FilterIndex(
+        n_rows=len(frame),
+        bitmaps={column: bitmaps[column] for column in FILTER_COLUMNS},
+        date_order=order,
+        dates=dates[order],
+        cube_labels=labels,
+        cube_shape=shape,
+        cells=cells,
+    )
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Geographic hierarchy of the counts: national -> region -> department.
+# Departments are mapped to their region (overseas departments are their own
+# region) by the bundled departements.csv, which also gives their chief town
+# and population (INSEE legal populations, rounded to the thousand; a missing
+# population leaves the densities of its units empty). The counts of every
+# unit of every level are summed once from the count cube, so region views,
+# drill-downs and densities per 100,000 inhabitants are lookups.
+REFERENCE_PATH = Path(__file__).with_name('departements.csv')
+LEVELS = ['National', 'Région', 'Département']
+NATIONAL = 'France'
+# Region of the department codes missing from the reference table
+UNKNOWN_REGION = 'Autre'
+# Departments from this many inhabitants are treated as major urban centres
+URBAN_POPULATION = 1_000_000
+
+
+@lru_cache
+def read_reference(path=REFERENCE_PATH):
+    # Nom, Chef-lieu, Région and Population per department code. Shared: read-only.
+    reference = pd.read_csv(path, dtype={'Département': str, 'Population': float})
+    return reference.set_index('Département')
+
+
+def describe_departments(codes, reference=None):
+    # Reference rows of department codes, codes missing from the table included
+    reference = read_reference() if reference is None else reference
+    described = reference.reindex(pd.Index(codes, name='Département'))
+    described['Région'] = described['Région'].fillna(UNKNOWN_REGION)
+    return described
+
+
+@dataclass(frozen=True)
+class GeoRollup:
+    counts: dict          # level -> units x specialties accreditation counts
+    summary: dict         # level -> Accreditations, Population, 'Per 100k' per unit
+    density: dict         # level -> units x specialties accreditations per 100k inhabitants
+    children: dict        # (level, unit) -> units of the next level, largest first
+    departments: pd.DataFrame  # reference rows of the departments in the data
+    unlocated: int        # accreditations without a department, only in the national counts
+
+    def drill(self, level, unit):
+        # Next level and the summary of the units of `unit` in it
+        child_level = LEVELS[LEVELS.index(level) + 1]
+        return child_level, self.summary[child_level].loc[self.children[(level, unit)]]
+
+
+def per_100k(counts, population):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return counts.div(population, axis=0) * 100_000
+
+
+def build_rollup(cube, reference=None):
+    reference = read_reference() if reference is None else reference
+    # Department x specialty counts; the extra slots hold the rows without a
+    # department or specialty, which still count in the totals
+    counts = cube.counts.sum(axis=(cube.axis('Year'), cube.axis('Statut'), cube.axis('OA')))
+    departments, specialties = cube.labels['Département'], cube.labels['Spécialité']
+    totals = counts.sum(axis=1)
+    present = np.flatnonzero(totals[:len(departments)] > 0)
+    used = counts.sum(axis=0)[:len(specialties)] > 0
+
+    department_counts = pd.DataFrame(counts[present][:, :len(specialties)][:, used],
+                                     index=departments[present].rename('Département'),
+                                     columns=specialties[used].rename('Spécialité'))
+    described = describe_departments(department_counts.index, reference)
+    regions = described['Région']
+    region_counts = department_counts.groupby(regions).sum()
+    region_counts.index.name = 'Région'
+    national_counts = pd.DataFrame(counts[:, :len(specialties)][:, used].sum(axis=0, keepdims=True),
+                                   index=pd.Index([NATIONAL], name='National'), columns=department_counts.columns)
+
+    # Populations of whole regions, not only of their departments in the data,
+    # unknown if one of their departments' is
+    population, member_of = reference['Population'], reference['Région']
+    region_population = population.groupby(member_of).sum().where(~population.isna().groupby(member_of).any())
+    populations = {
+        'National': pd.Series([population.sum(min_count=len(population))], index=national_counts.index),
+        'Région': region_population.reindex(region_counts.index),
+        'Département': described['Population'],
+    }
+    accreditations = {
+        'National': pd.Series([int(totals.sum())], index=national_counts.index),
+        'Région': pd.Series(totals[present], index=department_counts.index).groupby(regions).sum()
+                    .rename_axis('Région'),
+        'Département': pd.Series(totals[present], index=department_counts.index),
+    }
+    level_counts = {'National': national_counts, 'Région': region_counts, 'Département': department_counts}
+
+    summary, density = {}, {}
+    for level in LEVELS:
+        summary[level] = pd.DataFrame({
+            'Accreditations': accreditations[level],
+            'Population': populations[level],
+            'Per 100k': per_100k(accreditations[level].to_frame(), populations[level]).iloc[:, 0].round(2),
+        })
+        density[level] = per_100k(level_counts[level], populations[level])
+    summary['Département'] = summary['Département'].join(described[['Nom', 'Chef-lieu', 'Région']])
+
+    largest = summary['Région']['Accreditations'].sort_values(ascending=False)
+    children = {('National', NATIONAL): largest.index.tolist()}
+    for region, units in summary['Département'].groupby('Région')['Accreditations']:
+        children[('Région', region)] = units.sort_values(ascending=False).index.tolist()
+    return GeoRollup(
+        counts=level_counts,
+        summary=summary,
+        density=density,
+        children=children,
+        departments=described,
+        unlocated=int(totals[len(departments)]),
+    )
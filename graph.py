@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+
+# Practitioner - team - establishment graph. Each relation is a sparse
+# bipartite adjacency matrix whose entries count the accreditation rows
+# linking the two nodes:
+#  - practitioner x team           (N° RPPS x Nom équipe)
+#  - practitioner x establishment  (N° RPPS x FINESS)
+#  - team x establishment          (Nom équipe x FINESS)
+#  - establishment x department    (FINESS x Département)
+# Degrees are row / column counts of non-zero entries, shared nodes are
+# matrix products, and the queries below never group the rows again.
+
+
+@dataclass
+class AccreditationGraph:
+    practitioners: pd.Index        # RPPS numbers, the node id is the position
+    names: np.ndarray              # "Prénom Nom" per practitioner
+    teams: pd.Index
+    team_oa: np.ndarray            # accrediting body (OA) of each team
+    establishments: pd.Index       # FINESS codes
+    departments: pd.Index
+    practitioner_team: sparse.csr_matrix
+    practitioner_establishment: sparse.csr_matrix
+    team_establishment: sparse.csr_matrix
+    establishment_department: sparse.csr_matrix
+
+    def establishment_degrees(self):
+        # Practitioners, teams and accreditations per establishment, the
+        # establishments with the most teams first
+        degrees = pd.DataFrame({
+            'Département': _main_label(self.establishment_department, self.departments),
+            'Teams': self.team_establishment.getnnz(axis=0),
+            'Practitioners': self.practitioner_establishment.getnnz(axis=0),
+            'Accreditations': np.asarray(self.practitioner_establishment.sum(axis=0)).ravel(),
+        }, index=self.establishments.rename('FINESS'))
+        return degrees.sort_values(['Teams', 'Practitioners'], ascending=False)
+
+    def team_sizes(self):
+        # Practitioners and establishments per team, largest team first
+        sizes = pd.DataFrame({
+            'OA': self.team_oa,
+            'Practitioners': self.practitioner_team.getnnz(axis=0),
+            'Establishments': self.team_establishment.getnnz(axis=1),
+        }, index=self.teams.rename('Nom équipe'))
+        return sizes.sort_values(['Practitioners', 'Establishments'], ascending=False)
+
+    def multi_site_practitioners(self, min_sites=2):
+        # Practitioners accredited in at least `min_sites` establishments, with
+        # the number of departments those are in
+        sites = self.practitioner_establishment.getnnz(axis=1)
+        selected = np.flatnonzero(sites >= min_sites)
+        reach = _binary(self.practitioner_establishment[selected]) @ _binary(self.establishment_department)
+        shared = pd.DataFrame({
+            'Name': self.names[selected],
+            'Establishments': sites[selected],
+            'Departments': reach.getnnz(axis=1),
+            'Teams': self.practitioner_team[selected].getnnz(axis=1),
+        }, index=self.practitioners[selected].rename('N° RPPS'))
+        return shared.sort_values(['Establishments', 'Departments'], ascending=False)
+
+    def components(self):
+        # Connected components of practitioners, teams and establishments
+        # linked by an accreditation. Returns the component of every node (in
+        # practitioner, team, establishment order) and one row per component,
+        # largest first.
+        n_p, n_t, n_e = len(self.practitioners), len(self.teams), len(self.establishments)
+        # One edge per linked pair, in either direction (directed=False)
+        adjacency = sparse.bmat([
+            [sparse.csr_matrix((n_p, n_p)), self.practitioner_team, self.practitioner_establishment],
+            [None, sparse.csr_matrix((n_t, n_t)), self.team_establishment],
+            [None, None, sparse.csr_matrix((n_e, n_e))],
+        ], format='csr')
+        n_components, labels = csgraph.connected_components(adjacency, directed=False)
+        kinds = np.repeat([0, 1, 2], [n_p, n_t, n_e])
+        sizes = np.zeros((n_components, 3), dtype=np.int64)
+        np.add.at(sizes, (labels, kinds), 1)
+        summary = pd.DataFrame(sizes, columns=['Practitioners', 'Teams', 'Establishments'])
+        summary.index.name = 'Component'
+        summary = summary.assign(Nodes=sizes.sum(axis=1)).sort_values('Nodes', ascending=False)
+        return labels, summary
+
+
+def _binary(matrix):
+    matrix = matrix.copy()
+    matrix.data[:] = 1
+    return matrix
+
+
+def _main_label(matrix, labels):
+    # Label of the largest entry of every row, None for empty rows
+    main = np.asarray(labels, dtype=object)[np.asarray(matrix.argmax(axis=1)).ravel()] if len(labels) else \
+        np.full(matrix.shape[0], None, dtype=object)
+    main[matrix.getnnz(axis=1) == 0] = None
+    return main
+
+
+def _adjacency(rows, n_rows, columns, n_columns):
+    # Count of the (row, column) pairs, for the pairs with both ends known
+    known = (rows >= 0) & (columns >= 0)
+    return sparse.csr_matrix(
+        (np.ones(int(known.sum()), dtype=np.int32), (rows[known], columns[known])), shape=(n_rows, n_columns))
+
+
+def build_graph(frame):
+    practitioner_codes, practitioners = pd.factorize(frame['N° RPPS'])
+    practitioners = pd.Index(practitioners)
+    codes, labels = {}, {}
+    for column in ['Nom équipe', 'FINESS', 'Département', 'OA']:
+        values = frame[column].astype('category')
+        codes[column] = values.cat.codes.to_numpy().astype(np.int64)
+        labels[column] = pd.Index(values.cat.categories)
+    n_p, n_t, n_e, n_d = len(practitioners), len(labels['Nom équipe']), len(labels['FINESS']), len(labels['Département'])
+
+    # Name of each practitioner: the one on their first row
+    first_rows = np.unique(practitioner_codes[practitioner_codes >= 0], return_index=True)[1]
+    first_rows = np.flatnonzero(practitioner_codes >= 0)[first_rows]
+    names = (frame['Prénom'].iloc[first_rows].fillna('') + ' ' + frame['Nom'].iloc[first_rows].fillna(''))
+    # Accrediting body of each team: the one of most of its rows
+    team_oa = _adjacency(codes['Nom équipe'], n_t, codes['OA'], len(labels['OA']))
+
+    return AccreditationGraph(
+        practitioners=practitioners,
+        names=names.str.strip().to_numpy(dtype=object),
+        teams=labels['Nom équipe'],
+        team_oa=_main_label(team_oa, labels['OA']),
+        establishments=labels['FINESS'],
+        departments=labels['Département'],
+        practitioner_team=_adjacency(practitioner_codes, n_p, codes['Nom équipe'], n_t),
+        practitioner_establishment=_adjacency(practitioner_codes, n_p, codes['FINESS'], n_e),
+        team_establishment=_adjacency(codes['Nom équipe'], n_t, codes['FINESS'], n_e),
+        establishment_department=_adjacency(codes['FINESS'], n_e, codes['Département'], n_d),
+    )
@@ -0,0 +1,272 @@
+"""Ingest a new HAS export by diffing it against the stored dataset.
+
+Rows are matched on RPPS, specialty, accreditation date and FINESS (the
+export has one row per establishment, so RPPS + specialty + date alone is not
+unique). Inserted, updated and removed rows are appended to a change log, the
+count cube is updated from the delta only, and the typed snapshot, count cube,
+specialty index and department similarity index of the new version are
+written where the app looks for them, so replacing the CSV afterwards costs
+the app no parsing or recounting.
+
+Rows failing a data-quality check of validation.py are quarantined: they are
+left out of the new version and listed, with their reasons, in the quality
+report written next to the snapshot. An export without a single valid row
+is refused and leaves the store unchanged.
+
+The export is streamed in chunks of --chunk-rows rows: each chunk is typed,
+diffed against the stored row hashes, folded into the cube and specialty index
+and appended to the Parquet snapshot. Peak memory depends on the chunk size;
+besides the chunk only the row hashes (16 bytes per row) and the specialty
+index grow with the file.
+
+    python ingest.py NEW_EXPORT.csv [--store DIR] [--chunk-rows N]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from cube import AXES, CountCube, build_cube
+from data import (CHUNK_ROWS, COLUMNS, SnapshotWriter, file_fingerprint, iter_csv, read_derived,
+                  snapshot_path, tmp_path_for, write_derived)
+from similarity import build_similarity_index
+from specialties import build_specialty_index, merge_specialty_indexes
+from validation import Validator
+
+
+STORE_DIR = Path(__file__).with_name('.store')
+KEY_COLUMNS = ['N° RPPS', 'Spécialité', 'Date accréditation', 'FINESS']
+VALUE_COLUMNS = [column for column in COLUMNS if column not in KEY_COLUMNS]
+
+
+def row_hashes(frame, columns):
+    # Value-based hashes (categoricals hash their values, not their codes),
+    # so frames with different categories can be compared
+    return pd.util.hash_pandas_object(frame[columns], index=False).to_numpy()
+
+
+def iter_rows(path, chunk_rows=CHUNK_ROWS):
+    # Typed chunks of a Parquet file, read one row group slice at a time
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def read_hashes(store, chunk_rows=CHUNK_ROWS):
+    # Key and value hashes of the current rows, recomputed from the rows for
+    # stores written before the hashes were kept
+    path = store / 'hashes.npz'
+    if path.exists():
+        with np.load(path) as hashes:
+            return hashes['keys'], hashes['values']
+    keys, values = [np.empty(0, dtype=np.uint64)], [np.empty(0, dtype=np.uint64)]
+    for rows in iter_rows(store / 'current.parquet', chunk_rows):
+        keys.append(row_hashes(rows, KEY_COLUMNS))
+        values.append(row_hashes(rows, VALUE_COLUMNS))
+    return np.concatenate(keys), np.concatenate(values)
+
+
+def write_hashes(store, keys, values):
+    path = store / 'hashes.npz'
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, keys=keys, values=values)
+    os.replace(tmp_path, path)
+
+
+def rows_cube(rows):
+    rows = rows.reset_index(drop=True)
+    return build_cube(rows, build_specialty_index(rows['Spécialité']))
+
+
+def align_specialties(cube, tokens):
+    # Put the cube's specialty axis in token id order (chunks number their
+    # unknown tokens on their own). Specialties of the previous version that
+    # no row has any more are left at 0 by the delta, and dropped.
+    labels = dict(cube.labels, **{'Spécialité': pd.Index(tokens)})
+    empty = CountCube(labels=labels, counts=np.zeros(tuple(len(labels[name]) + 1 for name in AXES), dtype=np.int32))
+    aligned = empty.combine(cube)
+    axis, stale = aligned.axis('Spécialité'), len(aligned.labels['Spécialité']) - len(tokens)
+    if stale:
+        kept = np.append(np.arange(len(tokens)), len(aligned.labels['Spécialité']))
+        aligned = CountCube(labels=labels, counts=np.take(aligned.counts, kept, axis=axis))
+    return aligned
+
+
+def read_manifest(store):
+    path = store / 'manifest.json'
+    return json.loads(path.read_text()) if path.exists() else {'versions': []}
+
+
+def write_manifest(store, manifest):
+    path = store / 'manifest.json'
+    tmp_path = tmp_path_for(path)
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+
+
+def log_rows(rows, change, version):
+    # Change log rows: the row values plus the kind of change and the version
+    return rows.assign(change=change, version=version)
+
+
+def ingest(path, store=STORE_DIR, chunk_rows=CHUNK_ROWS):
+    start = time.perf_counter()
+    store = Path(store)
+    (store / 'changes').mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(store)
+
+    fingerprint = file_fingerprint(path)
+    if manifest['versions'] and manifest['versions'][-1]['fingerprint'] == fingerprint:
+        return manifest['versions'][-1]
+
+    current_path = store / 'current.parquet'
+    if manifest['versions']:
+        old_keys, old_values = read_hashes(store, chunk_rows)
+        # The new cube is the previous one plus the delta, recounted from the
+        # previous rows only if it was not kept
+        cube = read_derived(manifest['versions'][-1]['fingerprint'], 'cube')
+        if cube is None:
+            for old in iter_rows(current_path, chunk_rows):
+                cube = rows_cube(old) if cube is None else cube.combine(rows_cube(old))
+    else:
+        old_keys = old_values = np.empty(0, dtype=np.uint64)
+        cube = None
+    # Hash -> position of the old rows (the first one if a key is repeated)
+    first = ~pd.Index(old_keys).duplicated()
+    lookup, lookup_positions = pd.Index(old_keys[first]), np.flatnonzero(first)
+    seen = np.zeros(len(old_keys), dtype=bool)
+    # Old rows replaced by an update, whose previous values leave the cube
+    replaced = np.zeros(len(old_keys), dtype=bool)
+
+    version = len(manifest['versions']) + 1
+    counts = {'inserted': 0, 'updated': 0, 'removed': 0}
+    keys, values, indexes = [], [], []
+    rows = 0
+    validator = Validator()
+    with SnapshotWriter(snapshot_path(fingerprint)) as snapshot, \
+            SnapshotWriter(store / 'changes' / f'{version:06d}.parquet') as log:
+        for chunk in iter_csv(path, chunk_rows, validator):
+            chunk = chunk.reset_index(drop=True)
+            chunk_keys, chunk_values = row_hashes(chunk, KEY_COLUMNS), row_hashes(chunk, VALUE_COLUMNS)
+
+            matches = lookup.get_indexer(chunk_keys)
+            matched = matches >= 0
+            positions = lookup_positions[matches[matched]]
+            seen[positions] = True
+            updated = np.zeros(len(chunk), dtype=bool)
+            updated[matched] = chunk_values[matched] != old_values[positions]
+            replaced[positions[updated[matched]]] = True
+
+            log.write(log_rows(chunk[~matched], 'insert', version))
+            log.write(log_rows(chunk[updated], 'update', version))
+            counts['inserted'] += int((~matched).sum())
+            counts['updated'] += int(updated.sum())
+
+            # Fold the chunk into the new version: the cube only counts the
+            # inserted rows and the new values of the updated ones
+            snapshot.write(chunk)
+            added = ~matched | updated
+            if added.any():
+                cube = rows_cube(chunk[added]) if cube is None else cube.combine(rows_cube(chunk[added]))
+            indexes.append(build_specialty_index(chunk['Spécialité']))
+            keys.append(chunk_keys)
+            values.append(chunk_values)
+            rows += len(chunk)
+
+        if rows == 0:
+            # Leaving the writers by an exception discards what they wrote
+            raise ValueError(f'{path}: no valid row to ingest ({validator.rows} read, '
+                             f'{len(validator.report().quarantined)} quarantined), the store is unchanged')
+
+        # Old rows whose key no longer appears, and the previous values of the
+        # updated ones, read back from the previous version and subtracted
+        if not seen.all() or replaced.any():
+            offset = 0
+            for old in iter_rows(current_path, chunk_rows):
+                removed = ~seen[offset:offset + len(old)]
+                subtracted = removed | replaced[offset:offset + len(old)]
+                log.write(log_rows(old[removed], 'remove', version))
+                counts['removed'] += int(removed.sum())
+                if subtracted.any():
+                    cube = cube.combine(rows_cube(old[subtracted]), -1)
+                offset += len(old)
+
+    specialties = merge_specialty_indexes(indexes)
+    cube = align_specialties(cube, specialties.tokens)
+    write_derived(cube, fingerprint, 'cube')
+    # Department similarity: only the departments whose counts changed
+    # are renormalized
+    table = cube.table('Département', 'Spécialité')
+    previous = read_derived(manifest['versions'][-1]['fingerprint'], 'similarity') if manifest['versions'] else None
+    similarity = build_similarity_index(table) if previous is None else previous.update(table)
+    write_derived(similarity, fingerprint, 'similarity')
+    write_derived(specialties, fingerprint, 'specialties')
+    quality = validator.report()
+    write_derived(quality, fingerprint, 'quality')
+
+    # Current rows and their hashes for the next diff
+    tmp_path = tmp_path_for(current_path)
+    shutil.copyfile(snapshot_path(fingerprint), tmp_path)
+    os.replace(tmp_path, current_path)
+    write_hashes(store, np.concatenate(keys or [old_keys[:0]]), np.concatenate(values or [old_values[:0]]))
+
+    elapsed = time.perf_counter() - start
+    entry = {
+        'version': version,
+        'fingerprint': fingerprint,
+        'source': str(path),
+        'ingested_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows': rows,
+        'quarantined': len(quality.quarantined),
+        **counts,
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(rows / elapsed) if elapsed else None,
+    }
+    manifest['versions'].append(entry)
+    write_manifest(store, manifest)
+    return entry
+
+
+def snapshot_at(version, store=STORE_DIR):
+    # Rebuild the rows of a past version by replaying the change log
+    store = Path(store)
+    rows = None
+    for log_path in sorted((store / 'changes').glob('*.parquet'))[:version]:
+        log = pd.read_parquet(log_path)
+        if rows is None:
+            rows = log.iloc[:0].drop(columns=['change', 'version'])
+        changed = row_hashes(log[log['change'] != 'insert'], KEY_COLUMNS)
+        rows = rows[~pd.Index(row_hashes(rows, KEY_COLUMNS)).isin(changed)]
+        additions = log[log['change'] != 'remove'].drop(columns=['change', 'version'])
+        rows = pd.concat([rows, additions], ignore_index=True)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', type=Path, help='new HAS accreditation export')
+    parser.add_argument('--store', type=Path, default=STORE_DIR, help='dataset store with the change log')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows read and processed at a time')
+    args = parser.parse_args(argv)
+
+    try:
+        entry = ingest(args.csv, args.store, args.chunk_rows)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"Version {entry['version']}: {entry['rows']} rows, {entry['inserted']} inserted, "
+          f"{entry['updated']} updated, {entry['removed']} removed, {entry.get('quarantined', 0)} quarantined "
+          f"({entry.get('seconds', 0):.2f}s, {entry.get('rows_per_s') or 0:,} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
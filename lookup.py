@@ -0,0 +1,40 @@
+import numpy as np
+import streamlit as st
+
+from resources import get_derived
+from search import build_search_index
+
+
+# Practitioner and team lookup: names are matched through the trigram and
+# prefix index of search.py, RPPS and FINESS numbers exactly
+def run_lookup(dataset):
+    st.title("🔎 Practitioner and Team Lookup")
+    st.write("Search a practitioner by first or last name, a team by its name, or enter an exact RPPS or FINESS number. Accents, case and small typos do not matter.")
+
+    # Built once per dataset version and shared by every session
+    index = get_derived(dataset.fingerprint, "search", dataset, build_search_index)
+    query = st.text_input("Name, team, RPPS or FINESS")
+    limit = st.slider("Maximum number of matches", min_value=5, max_value=100, value=20)
+    if not query.strip():
+        return
+
+    # Exact number first
+    rows = index.lookup(query)
+    if len(rows):
+        st.write(f"Accreditations with the number {query.strip()}:")
+        st.dataframe(dataset.frame.iloc[rows], hide_index=True)
+        return
+
+    matches = index.search(query, k=limit)
+    if matches.empty:
+        st.write("No practitioner or team matches this search.")
+        return
+    st.subheader("Matches")
+    st.dataframe(matches, hide_index=True)
+
+    # Accreditations of every match, best match first
+    st.subheader("Accreditations")
+    rows = [index.rows(document) for document in matches.index]
+    accreditations = dataset.frame.iloc[np.concatenate(rows)]
+    accreditations = accreditations.assign(Match=np.repeat(matches['Match'].to_numpy(), [len(r) for r in rows]))
+    st.dataframe(accreditations[['Match', *dataset.frame.columns]], hide_index=True)
@@ -0,0 +1,186 @@
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from disk_cache import CACHE, cache_key
+from profiling import cache_event, stage
+
+
+# Fitted models are kept in a process-wide LRU cache, shared by every
+# Streamlit session, keyed on the input matrix and the hyperparameters, in
+# front of the disk cache shared by the processes of the host.
+# sklearn is imported by the functions that fit, not with the module: saved
+# results hold a SweepResult, and reading them must not pull in sklearn.
+MAX_CACHED_MODELS = 32
+
+# Above this many rows the mini-batch / incremental variants are used
+LARGE_MATRIX_ROWS = 20_000
+# Below this many rows a sweep runs inline: starting worker processes would
+# cost more than the fits themselves
+PARALLEL_MIN_ROWS = 2_000
+BATCH_SIZE = 4096
+# Silhouette is estimated on a sample for large matrices
+SILHOUETTE_SAMPLE = 5_000
+# Candidates whose labels agree less than this across seeds are not selected
+MIN_STABILITY = 0.8
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ProjectionResult:
+    # Cached objects are shared between sessions: treat them as read-only
+    scaler: object                # sklearn StandardScaler
+    pca: object                   # sklearn PCA or IncrementalPCA
+    kmeans: object                # sklearn KMeans or MiniBatchKMeans
+    projection: pd.DataFrame      # PC1..PCn and 'Cluster', indexed like the input
+    explained_variance: np.ndarray
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    candidates: pd.DataFrame      # one row per (n_components, n_clusters) with its scores
+    n_components: int             # selected configuration
+    n_clusters: int
+
+
+def matrix_fingerprint(table):
+    # Content hash of a table: values, row labels and column labels
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(table, index=True).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(table.columns.astype(str)), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _cached(key, compute):
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            cache_event('models', hit=True)
+            return _cache[key]
+
+    cache_event('models', hit=False)
+    result = CACHE.get_or_compute(cache_key('models', *key), compute)
+
+    with _lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_MODELS:
+            _cache.popitem(last=False)
+    return result
+
+
+def _estimators(n_rows, n_components, n_clusters, random_state):
+    # Exact PCA/KMeans, or their incremental / mini-batch variants for large inputs
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.decomposition import PCA, IncrementalPCA
+    if n_rows > LARGE_MATRIX_ROWS:
+        return (IncrementalPCA(n_components=n_components, batch_size=BATCH_SIZE),
+                MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=BATCH_SIZE))
+    return PCA(n_components=n_components), KMeans(n_clusters=n_clusters, random_state=random_state)
+
+
+def _fit_projection(table, n_components, n_clusters, random_state, scale):
+    from sklearn.preprocessing import StandardScaler
+    with stage('scaler'):
+        scaler = StandardScaler(with_mean=scale, with_std=scale)
+        scaled = scaler.fit_transform(table)
+
+    pca, kmeans = _estimators(len(table), n_components, n_clusters, random_state)
+    with stage('pca'):
+        components = pca.fit_transform(scaled)
+    with stage('kmeans'):
+        labels = kmeans.fit_predict(components)
+
+    projection = pd.DataFrame(components, columns=[f'PC{i + 1}' for i in range(n_components)], index=table.index)
+    projection['Cluster'] = labels
+    return ProjectionResult(
+        scaler=scaler,
+        pca=pca,
+        kmeans=kmeans,
+        projection=projection,
+        explained_variance=pca.explained_variance_ratio_,
+    )
+
+
+def fit_projection(table, n_components=2, n_clusters=3, random_state=42, scale=True):
+    # Standardize, project with PCA and cluster the projection with KMeans,
+    # reusing a previous fit of the same matrix with the same parameters
+    key = ('projection', matrix_fingerprint(table), n_components, n_clusters, random_state, scale)
+    return _cached(key, lambda: _fit_projection(table, n_components, n_clusters, random_state, scale))
+
+
+def _score_candidate(task):
+    # Runs in a worker process: fit one (n_components, n_clusters) candidate
+    # for every seed and score it
+    from sklearn.metrics import adjusted_rand_score, silhouette_score
+    scaled, n_components, n_clusters, seeds = task
+    pca, _ = _estimators(len(scaled), n_components, n_clusters, seeds[0])
+    components = pca.fit_transform(scaled)
+
+    fits = []
+    for seed in seeds:
+        _, kmeans = _estimators(len(scaled), n_components, n_clusters, seed)
+        fits.append(kmeans.fit(components))
+    labels = fits[0].labels_
+
+    sample_size = SILHOUETTE_SAMPLE if len(components) > SILHOUETTE_SAMPLE else None
+    silhouette = silhouette_score(components, labels, sample_size=sample_size, random_state=seeds[0])
+    # Stability: agreement of the labels of every other seed with the first one
+    stability = np.mean([adjusted_rand_score(labels, fit.labels_) for fit in fits[1:]]) if len(fits) > 1 else 1.0
+    return {
+        'n_components': n_components,
+        'n_clusters': n_clusters,
+        'silhouette': float(silhouette),
+        'inertia': float(fits[0].inertia_),
+        'stability': float(stability),
+        'explained_variance': float(pca.explained_variance_ratio_.sum()),
+    }
+
+
+def _sweep(table, cluster_counts, component_counts, seeds, max_workers):
+    from sklearn.preprocessing import StandardScaler
+    scaled = StandardScaler().fit_transform(table)
+    tasks = [
+        (scaled, n_components, n_clusters, tuple(seeds))
+        for n_components in component_counts if n_components <= min(table.shape)
+        for n_clusters in cluster_counts if n_clusters < len(table)
+    ]
+    if max_workers == 1 or (max_workers is None and len(table) < PARALLEL_MIN_ROWS):
+        scores = [_score_candidate(task) for task in tasks]
+    else:
+        # spawn rather than fork: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            scores = list(pool.map(_score_candidate, tasks))
+
+    candidates = pd.DataFrame(scores)
+    # Best silhouette among the stable candidates (all of them if none is stable)
+    stable = candidates[candidates['stability'] >= MIN_STABILITY]
+    best = (stable if len(stable) else candidates).sort_values('silhouette', ascending=False).iloc[0]
+    return SweepResult(
+        candidates=candidates,
+        n_components=int(best['n_components']),
+        n_clusters=int(best['n_clusters']),
+    )
+
+
+def sweep_clusters(table, cluster_counts=range(2, 9), component_counts=(2,), seeds=range(5), max_workers=None):
+    # Model selection for fit_projection: score every combination of
+    # component count and k with silhouette, inertia and stability across
+    # seeds, in parallel over a process pool. Results are cached like fits.
+    cluster_counts, component_counts, seeds = tuple(cluster_counts), tuple(component_counts), tuple(seeds)
+    key = ('sweep', matrix_fingerprint(table), cluster_counts, component_counts, seeds)
+    return _cached(key, lambda: _sweep(table, cluster_counts, component_counts, seeds, max_workers))
+
+
+def clear_model_cache():
+    with _lock:
+        _cache.clear()
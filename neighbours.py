@@ -0,0 +1,47 @@
+import pandas as pd
+import streamlit as st
+
+from charts import bar_chart
+from geography import describe_departments
+
+
+# Departments with the most similar specialty mix, from similarity.py.
+# `analysis` is a future of the index, see progressive.Sections.
+def run_neighbours(analysis, sections):
+    st.title("🧭 Similar Departments")
+    st.write("Which departments have a specialty mix most like a given department, and which specialties explain the difference? Each department is compared by the share of each specialty in its accreditations, so large and small departments can be close.")
+    st.write("**Cosine distance** compares the directions of the two profiles, **Jensen-Shannon divergence** compares them as probability distributions. Both are 0 for identical mixes.")
+    sections.show(analysis, find_neighbours)
+
+
+# Its own fragment: a new department, metric or neighbour only reruns the lookup
+@st.fragment
+def find_neighbours(index):
+    names = describe_departments(index.departments)["Nom"]
+    def label(code):
+        return code if pd.isna(names[code]) else f"{code} {names[code]}"
+
+    departments = index.departments.tolist()
+    if len(departments) < 2:
+        st.info("At least two departments must match the selected filters to compare them.")
+        return
+    department = st.selectbox("Department", departments, format_func=label,
+                              index=departments.index("75") if "75" in departments else 0)
+    metric = st.radio("Metric", ["cosine", "jensen-shannon"], horizontal=True,
+                      format_func=lambda metric: {"cosine": "Cosine", "jensen-shannon": "Jensen-Shannon"}[metric])
+    # A single possible neighbour leaves nothing to choose
+    k = 1 if len(departments) == 2 else \
+        st.slider("Number of neighbours", min_value=1, max_value=min(20, len(departments) - 1), value=min(5, len(departments) - 1))
+
+    neighbours = index.neighbours(department, k=k, metric=metric)
+    st.subheader(f"Departments Closest to {label(department)}")
+    st.dataframe(neighbours.assign(Nom=names.reindex(neighbours.index).to_numpy()))
+
+    # What separates the department from one of its neighbours
+    other = st.selectbox("Compare with", neighbours.index.tolist(), format_func=label)
+    contributions = index.contributions(department, other, metric=metric)
+    st.write(f"Distance: {contributions['Contribution'].sum():.4f}. The specialties whose shares differ the most contribute the most to it:")
+    st.dataframe(contributions.head(10).style.format("{:.4f}"))
+    st.image(bar_chart(contributions[[department, other]].head(10),
+                       title=f"Specialty Shares: {label(department)} vs. {label(other)}",
+                       xlabel="Specialty", ylabel="Share of accreditations"), width="stretch")
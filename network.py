@@ -0,0 +1,50 @@
+import streamlit as st
+
+from charts import bar_chart
+from graph import build_graph
+from resources import get_derived
+
+
+# Establishments (FINESS), teams and practitioners, from the sparse
+# adjacency matrices of graph.py
+def run_network(dataset):
+    st.title("🏨 Establishments and Teams")
+    st.write("Which establishments concentrate accredited teams, how large the teams are, and how practitioners are shared across establishments.")
+
+    # Built once per dataset version and shared by every session
+    graph = get_derived(dataset.fingerprint, "graph", dataset, build_graph)
+    limit = st.slider("Rows shown per table", min_value=5, max_value=100, value=20)
+
+    # Establishments with the most teams
+    st.subheader("Establishments Concentrating Accredited Teams")
+    degrees = graph.establishment_degrees()
+    st.write(f"{len(degrees):,} establishments, {(degrees['Teams'] > 0).sum():,} of them with at least one accredited team.")
+    st.dataframe(degrees.head(limit))
+    st.image(bar_chart(degrees["Teams"].head(limit), title="Accredited Teams per Establishment",
+                       xlabel="FINESS", ylabel="Teams"), width="stretch")
+
+    # Team sizes
+    st.subheader("Team Sizes")
+    sizes = graph.team_sizes()
+    st.write(f"{len(sizes):,} teams, with a median of {sizes['Practitioners'].median():.0f} practitioners and {sizes['Establishments'].median():.0f} establishments.")
+    st.dataframe(sizes.head(limit))
+    st.image(bar_chart(sizes.groupby("OA")["Practitioners"].sum().sort_values(ascending=False),
+                       title="Practitioners in Teams per Accrediting Body", xlabel="OA", ylabel="Practitioners"),
+             width="stretch")
+
+    # Practitioners working in several establishments
+    st.subheader("Multi-Site Practitioners")
+    min_sites = st.slider("Minimum number of establishments", min_value=2, max_value=10, value=2)
+    shared = graph.multi_site_practitioners(min_sites)
+    st.write(f"{len(shared):,} of {len(graph.practitioners):,} practitioners are accredited in {min_sites} establishments or more.")
+    st.dataframe(shared.head(limit))
+
+    # Groups of establishments linked by shared practitioners or teams
+    st.subheader("Connected Establishments")
+    st.write("Two establishments are connected when a practitioner or a team is accredited in both, directly or through other establishments.")
+    _, components = graph.components()
+    linked = components[components["Establishments"] > 1]
+    largest = components.iloc[0] if len(components) else None
+    st.write(f"{len(linked):,} groups link several establishments."
+             + ("" if largest is None else f" The largest gathers {largest['Establishments']:,} establishments, {largest['Teams']:,} teams and {largest['Practitioners']:,} practitioners."))
+    st.dataframe(linked.head(limit))
@@ -0,0 +1,32 @@
+"""Precompute the Case 1 and Case 2 results for a HAS export.
+
+Loads the dataset, runs every analysis once and writes a versioned results
+artifact next to the app. Web replicas then only read the artifact.
+
+    python precompute.py [--csv PATH] [--output DIR]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from analytics import RESULTS_DIR, compute_results, save_results
+from data import CSV_PATH, load_dataset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', type=Path, default=CSV_PATH, help='HAS accreditation export')
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR, help='directory of the results artifacts')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    dataset = load_dataset(args.csv)
+    results = compute_results(dataset)
+    path = save_results(results, args.output)
+    print(f'Wrote {path} ({len(dataset.frame)} rows, {time.perf_counter() - start:.2f}s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
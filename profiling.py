@@ -0,0 +1,171 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# Per-stage instrumentation. Pipeline stages are wrapped in `stage(name)`;
+# while a `recording()` is active in the current context (one Streamlit rerun,
+# and the pool tasks it submits, see progressive.submit) each stage records
+# its wall time, the CPU time of its thread, its peak traced memory when
+# memory tracing is on, and whether the caches it went through were hit or
+# missed. Without an active recording `stage` only looks up a context
+# variable, so the instrumentation can stay in place.
+#
+# Records are appended as JSON lines to $HAS_PROFILE_LOG when it is set.
+#
+# tracemalloc is process-wide (one traced peak, one start and stop), so memory
+# is traced for one recording at a time: a recording asking for it while
+# another one traces records no peaks, and says so (memory_busy).
+LOG_PATH = os.environ.get('HAS_PROFILE_LOG')
+
+_recording = contextvars.ContextVar('recording', default=None)
+_log_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_memory_owner = None          # the Recording tracing memory, if any
+
+
+class _ThreadState:
+    # The stages of a recording open in one thread, and the cache lookups
+    # made by that thread
+    def __init__(self):
+        self.open = []        # peak memory seen so far by each open stage
+        self.hits = self.misses = 0
+
+
+class Recording:
+    # Shared by the threads the rerun runs stages in: records and cache
+    # counts are updated under a lock, and stages nest per thread
+    def __init__(self, memory, context):
+        self.run = uuid.uuid4().hex[:12]
+        self.memory = memory
+        self.memory_busy = False  # memory asked for, but traced by another recording
+        self.context = context
+        self.records = []
+        self.cache = {}       # cache name -> {'hit': n, 'miss': n}
+        self._lock = threading.Lock()
+        self._threads = {}    # thread id -> _ThreadState
+
+    def _thread_state(self):
+        with self._lock:
+            return self._threads.setdefault(threading.get_ident(), _ThreadState())
+
+    def _fold_peak(self):
+        # Fold the traced peak into every stage open in any thread, then
+        # start a new peak. Called with the lock held.
+        current, peak = tracemalloc.get_traced_memory()
+        for state in self._threads.values():
+            state.open[:] = [max(value, peak) for value in state.open]
+        tracemalloc.reset_peak()
+        return current
+
+    def finished(self):
+        # The records of the stages that are over (a pool task may still be
+        # running one), in the order the stages started
+        with self._lock:
+            return [dict(record) for record in self.records if 'wall_s' in record]
+
+    def cache_event(self, name, hit):
+        state = self._thread_state()
+        with self._lock:
+            counts = self.cache.setdefault(name, {'hit': 0, 'miss': 0})
+            counts['hit' if hit else 'miss'] += 1
+        if hit:
+            state.hits += 1
+        else:
+            state.misses += 1
+
+
+def cache_event(name, hit):
+    # Called by the caches: one lookup of `name`, hit or miss
+    recording = _recording.get()
+    if recording is not None:
+        recording.cache_event(name, hit)
+
+
+@contextmanager
+def stage(name, cache=None):
+    # A stage is marked 'miss' if a cache missed while it ran, else 'hit' if a
+    # cache hit. `cache` names a cache the whole stage is a lookup in, whose
+    # misses are reported from inside (e.g. a st.cache_resource function):
+    # the lookup counts as a hit when none is.
+    recording = _recording.get()
+    if recording is None:
+        yield
+        return
+
+    # The CPU time is that of the stage's thread, named in the record. The
+    # peak memory is that of the process while the stage ran, allocations of
+    # the stages run at the same time by other threads included.
+    state = recording._thread_state()
+    with recording._lock:
+        current = recording._fold_peak() if recording.memory else 0
+        state.open.append(current)
+        record = {'stage': name, 'depth': len(state.open) - 1, 'thread': threading.current_thread().name}
+        recording.records.append(record)
+    hits, misses = state.hits, state.misses
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        result = {'wall_s': round(time.perf_counter() - wall, 6), 'cpu_s': round(time.thread_time() - cpu, 6)}
+        if cache is not None and state.misses == misses:
+            recording.cache_event(cache, hit=True)
+        if state.misses > misses:
+            result['cache'] = 'miss'
+        elif state.hits > hits:
+            result['cache'] = 'hit'
+        with recording._lock:
+            if recording.memory:
+                recording._fold_peak()
+            peak = state.open.pop()
+            if recording.memory:
+                result['peak_mb'] = round((peak - current) / 2**20, 3)
+            record.update(result)
+
+
+@contextmanager
+def recording(memory=False, log_path=LOG_PATH, **context):
+    # Record the stages run in this context until exit. `context` (page, ...)
+    # is added to every logged record.
+    global _memory_owner
+    run = Recording(memory, context)
+    started_tracing = False
+    if memory:
+        with _memory_lock:
+            if _memory_owner is None:
+                _memory_owner = run
+                started_tracing = not tracemalloc.is_tracing()
+                if started_tracing:
+                    tracemalloc.start()
+            else:
+                run.memory, run.memory_busy = False, True
+    token = _recording.set(run)
+    try:
+        yield run
+    finally:
+        _recording.reset(token)
+        if run.memory:
+            # Stages still running in the pool stop tracing too
+            with _memory_lock, run._lock:
+                run.memory = False
+                _memory_owner = None
+                if started_tracing:
+                    tracemalloc.stop()
+        if log_path:
+            write_log(run, log_path)
+
+
+def write_log(run, log_path):
+    timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+    lines = [
+        json.dumps({'ts': timestamp, 'run': run.run, **run.context, **record}, default=str)
+        for record in run.finished()
+    ]
+    with _log_lock, open(log_path, 'a', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in lines)
@@ -0,0 +1,97 @@
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+# Progressive rendering of the case pages. The expensive parts of a page (its
+# analysis results, each chart) are computed by a thread pool shared by every
+# session while the script goes on with the static narrative. Each section
+# reserves its place on the page with a placeholder, and Sections.finish
+# fills the placeholders in the order their results arrive.
+# Threads rather than processes: the sections share the in-process caches of
+# charts.py and models.py, and numpy and sklearn release the GIL in the fits.
+MAX_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="section")
+
+
+def submit(compute, *args):
+    # compute runs with the context of the submitting session, for the
+    # st.cache_* functions it goes through, and with a copy of its context
+    # variables, for the profiling recording of the rerun. It must not draw
+    # anything.
+    return _pool.submit(_run, get_script_run_ctx(), contextvars.copy_context(), compute, *args)
+
+
+def _run(ctx, context, compute, *args):
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    try:
+        return context.run(compute, *args)
+    finally:
+        add_script_run_ctx(thread, None)
+
+
+def _after(future, compute):
+    # compute() applied to the result of another section, None staying None.
+    # Only waits on futures submitted earlier, which the pool started first.
+    value = future.result()
+    return None if value is None else compute(value)
+
+
+class Sections:
+    def __init__(self, native_charts=False):
+        self._pending = []
+        self.native_charts = native_charts
+
+    def show(self, analysis, render, compute=None):
+        # Reserve a place for render(value) once `analysis` (a future) is done:
+        # value is compute(analysis), computed in the pool, or the analysis
+        # itself. Sections of an analysis that turns out to be None are left
+        # empty.
+        container = st.container()
+        placeholder = container.empty()
+        placeholder.caption("⏳ Loading…")
+        future = analysis if compute is None else submit(_after, analysis, compute)
+        self._pending.append((future, container, placeholder, render))
+
+    def image(self, analysis, chart):
+        # A chart: chart(analysis) returns its PNG bytes (see charts.py), or
+        # with native_charts the charts.NativeChart the browser draws
+        if not self.native_charts:
+            self.show(analysis, lambda png: st.image(png, width="stretch"), chart)
+            return
+        from charts import native
+        self.show(analysis, show_native, functools.partial(native, chart))
+
+    def finish(self):
+        # Fill the placeholders as their results arrive, in the script thread
+        waiting = {}
+        for future, *section in self._pending:
+            waiting.setdefault(future, []).append(section)
+        self._pending = []
+        for future in as_completed(waiting):
+            value = future.result()
+            for container, placeholder, render in waiting[future]:
+                placeholder.empty()
+                if value is not None:
+                    with container:
+                        render(value)
+
+
+def show_native(chart):
+    st.vega_lite_chart(chart.data, chart.spec, width="stretch")
+
+
+def show_chart(chart, *args, native_charts=False, **kwargs):
+    # A chart drawn outside of Sections, as Sections.image draws them
+    if native_charts:
+        from charts import native
+        show_native(native(chart, *args, **kwargs))
+    else:
+        st.image(chart(*args, **kwargs), width="stretch")
@@ -0,0 +1,45 @@
+import streamlit as st
+
+from validation import CHECKS
+
+
+# Data quality of the loaded CSV: the checks of validation.py run when the
+# CSV is parsed, the rows they quarantined and the rows they only flagged
+def run_quality(dataset):
+    st.title("🧪 Data Quality")
+    st.write("Every row of the HAS export is checked when the file is loaded. Rows failing an **error** check are quarantined: they are left out of every analysis. Rows failing a **warning** check are kept and only reported here.")
+
+    report = dataset.quality
+    if report is None:
+        st.info("No quality report for this version of the data: it was loaded from a snapshot written before validation.")
+        return
+
+    quarantined = len(report.quarantined)
+    flagged = report.issues.loc[report.issues["Check"].map(lambda name: CHECKS[name][0]) == "warning", "Line"].nunique()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rows read", f"{report.rows:,}")
+    col2.metric("Rows quarantined", f"{quarantined:,}")
+    col3.metric("Rows with warnings", f"{flagged:,}")
+
+    st.subheader("Checks")
+    st.dataframe(report.summary())
+
+    st.subheader("Quarantined Rows")
+    if quarantined:
+        st.write("Raw values of the rows left out of the dataset, by line of the CSV file, with the checks they failed.")
+        st.dataframe(report.quarantined)
+    else:
+        st.write("No row was quarantined.")
+
+    st.subheader("Flagged Values")
+    names = [name for name in CHECKS if (report.issues["Check"] == name).any()]
+    if not names:
+        st.write("No row failed a check.")
+        return
+    name = st.selectbox("Check", names, format_func=lambda name: f"{name}: {CHECKS[name][2]}")
+    issues = report.issues[report.issues["Check"] == name]
+    if CHECKS[name][1] is not None:
+        st.write("Most frequent values failing this check:")
+        st.dataframe(issues["Value"].value_counts().rename_axis(CHECKS[name][1]).rename("Rows").head(50))
+    st.write(f"Lines of the {len(issues):,} rows failing this check:")
+    st.dataframe(issues.set_index("Line").head(1000))
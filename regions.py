@@ -0,0 +1,67 @@
+import pandas as pd
+import streamlit as st
+
+from charts import bar_chart
+from geography import NATIONAL
+
+
+# Drill-down from France to its regions and departments. Every view is a
+# lookup in the tables of geography.build_rollup, nothing is recounted.
+# `analysis` is a future of them, see progressive.Sections.
+def run_regions(analysis, sections):
+    st.title("🗺️ Regions and Departments")
+    st.write("Accreditations of each level of the territory, and accreditations per 100,000 inhabitants. Choose a region to see its departments, then a department to see its specialties.")
+    sections.show(analysis, drill_down)
+
+
+# Its own fragment: choosing a region, a department or a specialty only
+# reruns the drill-down
+@st.fragment
+def drill_down(geography):
+    names = geography.departments["Nom"]
+    region = st.selectbox("Region", [NATIONAL, *geography.children[("National", NATIONAL)]])
+    level, unit = ("National", NATIONAL) if region == NATIONAL else ("Région", region)
+    if level == "Région":
+        department = st.selectbox("Department", ["All departments", *geography.children[("Région", region)]],
+                                  format_func=lambda code: code if pd.isna(names.get(code)) else f"{code} {names[code]}")
+        if department != "All departments":
+            level, unit = "Département", department
+    specialties = geography.counts["National"].columns
+    specialty = st.selectbox("Specialty", ["All specialties", *specialties])
+
+    # Totals of the selected unit
+    summary = geography.summary[level].loc[unit]
+    total, population, density = st.columns(3)
+    total.metric("Accreditations", f"{int(summary['Accreditations']):,}")
+    population.metric("Population", "unknown" if pd.isna(summary["Population"]) else f"{summary['Population']:,.0f}")
+    density.metric("Per 100,000 inhabitants", "–" if pd.isna(summary["Per 100k"]) else f"{summary['Per 100k']:.2f}")
+    if level == "National" and geography.unlocated:
+        st.caption(f"{geography.unlocated:,} accreditations without a department are only counted nationally.")
+
+    if level == "Département":
+        # A department: its specialties
+        st.subheader(f"Specialties in {unit} ({summary['Nom']})")
+        table = pd.DataFrame({
+            "Accreditations": geography.counts[level].loc[unit],
+            "Per 100k": geography.density[level].loc[unit].round(2),
+        })
+        table = table[table["Accreditations"] > 0].sort_values("Accreditations", ascending=False)
+        st.dataframe(table)
+        if table["Per 100k"].notna().any():
+            st.image(bar_chart(table["Per 100k"], title=f"Accreditations per 100,000 Inhabitants in {unit}",
+                               xlabel="Specialty", ylabel="Per 100k"), width="stretch")
+        return
+
+    # France or a region: the units one level down
+    child_level, children = geography.drill(level, unit)
+    st.subheader(f"{'Regions' if child_level == 'Région' else 'Departments'} of {unit}")
+    if specialty != "All specialties":
+        children = children.assign(**{
+            "Accreditations": geography.counts[child_level].loc[children.index, specialty],
+            "Per 100k": geography.density[child_level].loc[children.index, specialty].round(2),
+        })
+    st.dataframe(children)
+    densities = children["Per 100k"].dropna().sort_values(ascending=False)
+    if len(densities):
+        title = "Accreditations per 100,000 Inhabitants" + ("" if specialty == "All specialties" else f": {specialty}")
+        st.image(bar_chart(densities, title=title, xlabel=child_level, ylabel="Per 100k"), width="stretch")
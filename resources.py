@@ -0,0 +1,45 @@
+import streamlit as st
+
+import profiling
+
+
+# Resources shared by every session of the process, for app.py and the pages.
+# The data modules are imported by the functions, so that the Overview page
+# imports none of them.
+
+# The typed dataset is loaded once per process and shared, without copies, by
+# every session and both cases. It is only loaded once a case is opened.
+@st.cache_resource
+def get_dataset():
+    from data import load_dataset
+    profiling.cache_event("dataset", hit=False)
+    return load_dataset()
+
+# Case results: read the artifact written by precompute.py for the current
+# dataset version when there is one, otherwise compute them once per host
+# (through the disk cache) and keep them for the process
+@st.cache_resource
+def get_results():
+    from analytics import cached_results, load_results
+    from data import file_fingerprint
+    profiling.cache_event("results", hit=False)
+    fingerprint = file_fingerprint()
+    results = load_results(fingerprint)
+    if results is None:
+        results = cached_results(fingerprint, get_dataset)
+    return results
+
+# One analysis of a filtered subset (only the one the page renders), for the
+# most recent selections of any session
+@st.cache_resource(max_entries=64)
+def get_filtered_result(selection, name):
+    from analytics import cached_result
+    profiling.cache_event("filtered_results", hit=False)
+    return cached_result(get_dataset().fingerprint, get_dataset, name, selection)
+
+# A structure derived from the dataset (search index, graph...), built once
+# per dataset version by build(frame), see data.load_or_build
+@st.cache_resource
+def get_derived(fingerprint, name, _dataset, _build):
+    from data import load_or_build
+    return load_or_build(_dataset, name, _build)
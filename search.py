@@ -0,0 +1,185 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# Practitioner and team lookup. The searchable documents are the distinct
+# practitioner names ("Prénom Nom") and team names, each mapped to the rows
+# that carry it, so the index grows with the number of distinct names rather
+# than with the number of rows. Text is only normalized and split into
+# trigrams once per distinct first name, last name and team; the documents
+# combine those with sparse row sums. A query is matched against them by:
+#  - word prefixes, through a sorted array of the documents' words
+#  - trigram similarity (typo tolerant), through a documents x trigrams matrix
+# and RPPS / FINESS numbers are looked up exactly in hash maps.
+# Share of the query's trigrams a document must contain to match
+MIN_SIMILARITY = 0.5
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    # Lower case, accents and punctuation removed: "Hélène D'Anjou" -> "helene d anjou"
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(NON_ALNUM.split(text.casefold())).strip()
+
+
+def trigrams(text):
+    # Trigrams of each word padded with two leading and one trailing space, so
+    # that word starts weigh more than word middles
+    return {f'  {word} '[i:i + 3] for word in text.split() for i in range(len(word) + 1)}
+
+
+@dataclass
+class SearchIndex:
+    texts: np.ndarray          # document labels, the document id is the position
+    kinds: np.ndarray          # 'Practitioner' or 'Team' per document
+    row_ptr: np.ndarray        # rows of document d: row_ids[row_ptr[d]:row_ptr[d + 1]]
+    row_ids: np.ndarray
+    vocabulary: dict           # trigram -> column of the matrix
+    matrix: sparse.csc_matrix  # documents x trigrams incidence
+    sizes: np.ndarray          # number of distinct trigrams per document
+    words: np.ndarray          # normalized words of every document, sorted
+    word_documents: np.ndarray # the document of each of those words
+    rpps: dict                 # RPPS number -> row ids
+    finess: dict               # FINESS code -> row ids
+
+    def rows(self, document):
+        return self.row_ids[self.row_ptr[document]:self.row_ptr[document + 1]]
+
+    def lookup(self, query):
+        # Exact RPPS or FINESS match, empty if the query is neither
+        query = query.strip()
+        if query.isascii() and query.isdigit() and int(query) in self.rpps:
+            return self.rpps[int(query)]
+        return self.finess.get(query.upper(), np.empty(0, dtype=np.int64))
+
+    def prefix_mask(self, query):
+        # Per document: does every query word start one of its words
+        mask = np.ones(len(self.texts), dtype=bool)
+        for word in query.split():
+            first, last = np.searchsorted(self.words, [word, word + '\uffff'])
+            matches = np.zeros(len(self.texts), dtype=bool)
+            matches[self.word_documents[first:last]] = True
+            mask &= matches
+        return mask
+
+    def search(self, query, k=20):
+        # Top-k documents: prefix matches first, then by the share of the
+        # query's trigrams found in the document, ties going to the closest
+        # document overall (Jaccard index of the trigram sets)
+        query = normalize(query)
+        grams = trigrams(query)
+        columns = [self.vocabulary[gram] for gram in grams if gram in self.vocabulary]
+        if not columns:
+            return pd.DataFrame({'Match': [], 'Type': [], 'Score': []})
+
+        shared = np.asarray(self.matrix[:, columns].sum(axis=1)).ravel()
+        candidates = np.flatnonzero(shared >= MIN_SIMILARITY * len(grams))
+        shared = shared[candidates]
+        score = shared / len(grams)
+        score += self.prefix_mask(query)[candidates]
+        # Ranking key: score then Jaccard index, folded into one number
+        rank = score + shared / (self.sizes[candidates] + len(grams) - shared) / 10
+
+        if len(candidates) > k:
+            top = np.argpartition(-rank, k - 1)[:k]
+            candidates, score, rank = candidates[top], score[top], rank[top]
+        order = np.argsort(-rank, kind='stable')
+        candidates, score = candidates[order], score[order]
+        return pd.DataFrame({
+            'Match': self.texts[candidates],
+            'Type': self.kinds[candidates],
+            'Score': score.round(3),
+        }, index=pd.Index(candidates, name='document'))
+
+
+class Vocabulary(dict):
+    # trigram -> column id, assigned in order of appearance
+
+    def add(self, values):
+        # Trigram incidence (as COO entries) and words of each distinct value,
+        # and the code of every row in those values (-1 if missing)
+        values = values.astype('category')
+        normalized = [normalize(value) for value in values.cat.categories]
+        rows, columns = [], []
+        for code, text in enumerate(normalized):
+            for gram in trigrams(text):
+                rows.append(code)
+                columns.append(self.setdefault(gram, len(self)))
+        words = pd.DataFrame([(code, word) for code, text in enumerate(normalized) for word in set(text.split())],
+                             columns=['code', 'word'])
+        return values.cat.codes.to_numpy(), values.cat.categories, (rows, columns), words
+
+    def matrix(self, entries, n_values):
+        # Incidence of the values plus a trailing empty row picked by code -1
+        rows, columns = entries
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                 shape=(n_values + 1, len(self)))
+
+
+def row_groups(codes, n_documents):
+    # Rows of each document as one array sorted by document, with offsets
+    rows = np.flatnonzero(codes >= 0)
+    order = rows[np.argsort(codes[rows], kind='stable')]
+    counts = np.bincount(codes[rows], minlength=n_documents)
+    return np.concatenate([[0], np.cumsum(counts)]), order
+
+
+def exact_map(values):
+    # value -> row ids, for the rows that have a value
+    return {value: np.asarray(rows, dtype=np.int64)
+            for value, rows in values.groupby(values, observed=True).indices.items()}
+
+
+def build_search_index(frame):
+    vocabulary = Vocabulary()
+    first_codes, first_names, first_entries, first_words = vocabulary.add(frame['Prénom'])
+    last_codes, last_names, last_entries, last_words = vocabulary.add(frame['Nom'])
+    team_codes, teams, team_entries, team_words = vocabulary.add(frame['Nom équipe'])
+
+    # Practitioner documents: the distinct (first name, last name) pairs, with
+    # a missing name pointing to the trailing empty row of its matrix
+    first = np.where(first_codes < 0, len(first_names), first_codes).astype(np.int64)
+    last = np.where(last_codes < 0, len(last_names), last_codes).astype(np.int64)
+    named = (first_codes >= 0) | (last_codes >= 0)
+    name_codes = np.full(len(frame), -1, dtype=np.int64)
+    name_codes[named], unique_pairs = pd.factorize(first[named] * (len(last_names) + 1) + last[named])
+    unique_first, unique_last = np.divmod(unique_pairs, len(last_names) + 1)
+    name_texts = (pd.Series(np.append(first_names, '')[unique_first], dtype=object) + ' '
+                  + pd.Series(np.append(last_names, '')[unique_last], dtype=object)).str.strip().to_numpy()
+
+    # Trigrams of a name: those of its first name plus those of its last name
+    names = (vocabulary.matrix(first_entries, len(first_names))[unique_first]
+             + vocabulary.matrix(last_entries, len(last_names))[unique_last])
+    names.data[:] = 1
+    matrix = sparse.vstack([names, vocabulary.matrix(team_entries, len(teams))[:-1]]).tocsc()
+
+    name_words = pd.concat([
+        pd.DataFrame({'document': np.arange(len(unique_pairs)), 'code': codes}).merge(words, on='code')
+        for codes, words in ((unique_first, first_words), (unique_last, last_words))
+    ])
+    words = pd.concat([
+        name_words[['document', 'word']],
+        pd.DataFrame({'document': team_words['code'] + len(unique_pairs), 'word': team_words['word']}),
+    ]).drop_duplicates().sort_values('word', kind='stable')
+
+    name_ptr, name_rows = row_groups(name_codes, len(unique_pairs))
+    team_ptr, team_rows = row_groups(team_codes, len(teams))
+    return SearchIndex(
+        texts=np.concatenate([name_texts, np.asarray(teams, dtype=object)]),
+        kinds=np.array(['Practitioner'] * len(unique_pairs) + ['Team'] * len(teams), dtype=object),
+        row_ptr=np.concatenate([name_ptr, name_ptr[-1] + team_ptr[1:]]),
+        row_ids=np.concatenate([name_rows, team_rows]).astype(np.int64),
+        vocabulary=dict(vocabulary),
+        matrix=matrix,
+        sizes=np.diff(matrix.tocsr().indptr).astype(np.int32),
+        words=words['word'].to_numpy(dtype=str),
+        word_documents=words['document'].to_numpy(dtype=np.int64),
+        rpps=exact_map(frame['N° RPPS']),
+        finess=exact_map(frame['FINESS'].astype('string').str.upper()),
+    )
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.special import rel_entr
+
+
+# Department similarity over specialty profiles: each department is the row
+# of the department x specialty count table normalized to shares, so that
+# large and small departments compare by their mix rather than their size.
+# The index stores the profiles and their unit-length version once; a lookup
+# is one matrix-vector product (cosine) or one vectorized pass over the
+# profiles (Jensen-Shannon), which is interactive for the ~100 departments
+# and would stay so for a few thousand rows.
+METRICS = ['cosine', 'jensen-shannon']
+
+
+@dataclass(frozen=True)
+class SimilarityIndex:
+    departments: pd.Index
+    specialties: pd.Index
+    counts: np.ndarray        # departments x specialties
+    profiles: np.ndarray      # counts / row sums
+    unit: np.ndarray          # profiles / their L2 norm
+
+    def distances(self, department, metric='cosine'):
+        # Distance of every department to `department`, 0 for itself
+        i = self.departments.get_loc(department)
+        if metric == 'cosine':
+            return np.clip(1 - self.unit @ self.unit[i], 0, None)
+        if metric == 'jensen-shannon':
+            return _js_terms(self.profiles, self.profiles[i]).sum(axis=1)
+        raise ValueError(f'unknown metric {metric!r}, expected one of {METRICS}')
+
+    def neighbours(self, department, k=5, metric='cosine'):
+        # The k departments closest to `department`, closest first
+        distances = self.distances(department, metric)
+        others = np.flatnonzero(self.departments != department)
+        if len(others) > k:
+            others = others[np.argpartition(distances[others], k - 1)[:k]]
+        others = others[np.argsort(distances[others], kind='stable')]
+        return pd.DataFrame({'Distance': distances[others]}, index=self.departments[others].rename('Département'))
+
+    def contributions(self, department, other, metric='cosine'):
+        # Share of each specialty in both departments and its term of the
+        # distance between them; the terms sum to the distance
+        a, b = self.departments.get_loc(department), self.departments.get_loc(other)
+        if metric == 'cosine':
+            # 1 - cos(u, v) = sum((u - v)^2) / 2 for unit vectors
+            terms = (self.unit[a] - self.unit[b]) ** 2 / 2
+        elif metric == 'jensen-shannon':
+            terms = _js_terms(self.profiles[b][None], self.profiles[a])[0]
+        else:
+            raise ValueError(f'unknown metric {metric!r}, expected one of {METRICS}')
+        table = pd.DataFrame({
+            department: self.profiles[a],
+            other: self.profiles[b],
+            'Contribution': terms,
+        }, index=self.specialties.rename('Spécialité'))
+        return table.sort_values('Contribution', ascending=False)
+
+    def update(self, table):
+        # Index of a new department x specialty table (e.g. after an ingest or
+        # with filters), renormalizing only the departments whose counts changed
+        table = table.reindex(columns=self.specialties.append(table.columns.difference(self.specialties)),
+                              fill_value=0)
+        counts = table.to_numpy(dtype=float)
+        old_rows = self.departments.get_indexer(table.index)
+        old_columns = table.columns.get_indexer(self.specialties)
+        previous = np.zeros_like(counts)
+        previous[np.ix_(old_rows >= 0, old_columns)] = self.counts[old_rows[old_rows >= 0]]
+        changed = (old_rows < 0) | (previous != counts).any(axis=1)
+
+        # Unchanged departments keep their stored rows (their new specialties are 0)
+        profiles, unit = np.zeros_like(counts), np.zeros_like(counts)
+        kept = ~changed
+        profiles[np.ix_(kept, old_columns)] = self.profiles[old_rows[kept]]
+        unit[np.ix_(kept, old_columns)] = self.unit[old_rows[kept]]
+        profiles[changed], unit[changed] = _normalize(counts[changed])
+        return SimilarityIndex(departments=table.index, specialties=table.columns, counts=counts,
+                               profiles=profiles, unit=unit)
+
+
+def _normalize(counts):
+    # Shares per row, and those scaled to unit length (empty rows stay 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profiles = np.nan_to_num(counts / counts.sum(axis=1, keepdims=True))
+        unit = np.nan_to_num(profiles / np.linalg.norm(profiles, axis=1, keepdims=True))
+    return profiles, unit
+
+
+def _js_terms(profiles, profile):
+    # Per-specialty terms of the Jensen-Shannon divergence (natural log,
+    # between 0 and ln 2) of each row of `profiles` to `profile`
+    mixture = (profiles + profile) / 2
+    return (rel_entr(profiles, mixture) + rel_entr(profile, mixture)) / 2
+
+
+def build_similarity_index(table):
+    # table: departments x specialties counts, e.g. analytics.specialty_distribution
+    counts = table.to_numpy(dtype=float)
+    profiles, unit = _normalize(counts)
+    return SimilarityIndex(departments=table.index, specialties=table.columns, counts=counts,
+                           profiles=profiles, unit=unit)
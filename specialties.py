@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from scipy import sparse
+
+
+# Canonical tokens found in the HAS 'Spécialité' field, in a fixed order so
+# that token ids do not move when a new export is loaded. The first block is
+# the accreditation specialties (the first token of each field), in the order
+# the case narratives refer to them ("Specialty 4" is orthopaedic surgery).
+SPECIALTIES = [
+    'Anesthésie-réanimation',
+    'Cardiologie (activité interventionnelle)',
+    'Chirurgie infantile',
+    'Chirurgie maxillo-faciale et stomatologie',
+    'Chirurgie orthopédique et traumatologie',
+    'Chirurgie plastique, reconstructrice et esthétique',
+    'Chirurgie thoracique et cardio-vasculaire',
+    'Chirurgie urologique',
+    'Chirurgie vasculaire',
+    'Chirurgie viscérale et digestive',
+    'Gastro-entérologie (activité interventionnelle)',
+    'Gynécologie-obstétrique',
+    'Neurochirurgie',
+    'Oto-rhino-laryngologie',
+    'Radiologie et Imagerie médicale',
+]
+SECONDARY = [
+    'Activité de réanimation',
+    'Activité de soins intensifs',
+    "Activités d'obstétrique",
+    'Chirurgie de la face et du cou',
+    'Chirurgie maxillo-faciale',
+    'Gynécologie médicale et gynécologie-obstétrique',
+    'Stomatologie (activité chirurgicale)',
+]
+KNOWN_TOKENS = SPECIALTIES + SECONDARY
+
+# Tokens are separated by ';'. A comma only separates two tokens when the next
+# word is capitalised ("Gynécologie-obstétrique, Gynécologie médicale ...")
+# so that names such as "Chirurgie plastique, reconstructrice ..." stay whole.
+TOKEN_SEPARATOR = re.compile(r';|,\s*(?=[A-ZÀ-Ý])')
+
+
+def parse_specialty(value):
+    # Split one raw 'Spécialité' value into its canonical tokens
+    if not isinstance(value, str):
+        return []
+    value = value.replace('\xa0', ' ')
+    tokens = (' '.join(token.split()) for token in TOKEN_SEPARATOR.split(value))
+    return [token for token in tokens if token]
+
+
+# Which tokens each row carries. Counts are not taken here but from the count
+# cube (cube.py), whose specialty axis is `primary`.
+@dataclass
+class SpecialtyIndex:
+    tokens: list             # token labels, the token id is the position
+    primary: np.ndarray      # per row: id of the first (accreditation) token, -1 if none
+    matrix: sparse.csr_matrix  # rows x tokens incidence matrix
+    postings: dict           # token -> sorted row ids
+
+    def rows(self, token):
+        # Row ids carrying a token, empty if the token is unknown
+        return self.postings.get(token, np.empty(0, dtype=np.int64))
+
+    def mask(self, token):
+        mask = np.zeros(self.matrix.shape[0], dtype=bool)
+        mask[self.rows(token)] = True
+        return mask
+
+
+def build_specialty_index(values):
+    # Parse each distinct value once, then broadcast to rows through the
+    # categorical codes
+    values = values.astype('category')
+    parsed = [parse_specialty(category) for category in values.cat.categories]
+
+    unknown = sorted({token for tokens in parsed for token in tokens} - set(KNOWN_TOKENS))
+    tokens = KNOWN_TOKENS + unknown
+    ids = {token: i for i, token in enumerate(tokens)}
+
+    # Category x token incidence, expanded to rows by indexing with the codes
+    category_matrix = sparse.lil_matrix((len(parsed), len(tokens)), dtype=np.int8)
+    category_primary = np.full(len(parsed) + 1, -1, dtype=np.int16)
+    for i, category_tokens in enumerate(parsed):
+        for token in category_tokens:
+            category_matrix[i, ids[token]] = 1
+        if category_tokens:
+            category_primary[i] = ids[category_tokens[0]]
+
+    codes = values.cat.codes.to_numpy()
+    empty = sparse.csr_matrix((1, len(tokens)), dtype=np.int8)
+    # Missing values have code -1, which picks the trailing empty row
+    matrix = sparse.vstack([category_matrix.tocsr(), empty]).tocsr()[codes]
+    primary = category_primary[codes]
+    return SpecialtyIndex(tokens=tokens, primary=primary, matrix=matrix, postings=build_postings(matrix, tokens))
+
+
+def build_postings(matrix, tokens):
+    columns = matrix.tocsc()
+    postings = {
+        token: columns.indices[columns.indptr[i]:columns.indptr[i + 1]].astype(np.int64)
+        for i, token in enumerate(tokens)
+        if columns.indptr[i + 1] > columns.indptr[i]
+    }
+    for row_ids in postings.values():
+        row_ids.sort()
+    return postings
+
+
+def merge_specialty_indexes(indexes):
+    # Stack the indexes of consecutive row chunks into the index of all their
+    # rows. Each chunk numbers its unknown tokens on its own, so token ids are
+    # remapped to the merged vocabulary, built like build_specialty_index does.
+    unknown = sorted({token for index in indexes for token in index.tokens} - set(KNOWN_TOKENS))
+    tokens = KNOWN_TOKENS + unknown
+    ids = {token: i for i, token in enumerate(tokens)}
+
+    matrices, primaries = [], []
+    for index in indexes:
+        remap = np.array([ids[token] for token in index.tokens])
+        matrix = index.matrix.tocoo()
+        matrices.append(sparse.csr_matrix((matrix.data, (matrix.row, remap[matrix.col])),
+                                          shape=(matrix.shape[0], len(tokens))))
+        primaries.append(np.where(index.primary >= 0, remap[np.maximum(index.primary, 0)], -1).astype(np.int16))
+
+    matrix = sparse.vstack(matrices).tocsr() if matrices else sparse.csr_matrix((0, len(tokens)), dtype=np.int8)
+    primary = np.concatenate(primaries) if primaries else np.empty(0, dtype=np.int16)
+    return SpecialtyIndex(tokens=tokens, primary=primary, matrix=matrix, postings=build_postings(matrix, tokens))
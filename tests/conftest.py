@@ -0,0 +1,34 @@
+import os
+
+# The disk cache is shared by the processes of the host: keep the tests out of it
+os.environ['HAS_CACHE_DIR'] = ''
+
+import pandas as pd
+import pytest
+
+import data
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    # Snapshots, derived structures and fingerprints of the test exports go
+    # to a temporary directory instead of next to the app
+    directory = tmp_path / 'snapshots'
+    monkeypatch.setattr(data, 'SNAPSHOT_DIR', directory)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def export():
+    # The first 600 rows of the shipped HAS export, as the raw strings of the CSV
+    return pd.read_csv(data.CSV_PATH, dtype=str, keep_default_na=False, na_values=[''], nrows=600)
+
+
+@pytest.fixture
+def write_export(tmp_path):
+    # Write raw rows as a CSV export, returning its path
+    def write(rows, name):
+        path = tmp_path / f'{name}.csv'
+        rows.to_csv(path, index=False)
+        return path
+    return write
@@ -0,0 +1,56 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import build_cube
+from data import read_csv
+from filters import Selection, build_filter_index
+from specialties import build_specialty_index, parse_specialty
+
+SELECTIONS = [
+    Selection(),
+    Selection(departments=('75', '13')),
+    Selection(specialties=('Gynécologie-obstétrique',)),
+    # A secondary activity, only found after the first token of the field
+    Selection(specialties=("Activités d'obstétrique",)),
+    Selection(specialties=('Neurochirurgie', 'Chirurgie urologique'), statut=('Libéral',)),
+    Selection(oa=('GYNERISQ', 'ORTHORISQ'), departments=('59',)),
+    Selection(dates=(datetime.date(2020, 1, 1), datetime.date(2021, 12, 31))),
+    Selection(departments=('ZZ',)),
+]
+
+
+@pytest.fixture
+def frame(export, write_export):
+    return read_csv(write_export(export, 'export'))
+
+
+def expected_mask(frame, selection):
+    # The rows of the selection, with pandas
+    mask = pd.Series(True, index=frame.index)
+    for column, selected in selection.constraints().items():
+        if column == 'Spécialité':
+            mask &= frame[column].astype(object).map(lambda value: any(token in parse_specialty(value)
+                                                                       for token in selected))
+        else:
+            mask &= frame[column].isin(selected)
+    if selection.dates is not None:
+        start, end = (pd.Timestamp(date) for date in selection.dates)
+        mask &= frame['Date accréditation'].between(start, end)
+    return mask.to_numpy()
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_filter_bitmaps_match_a_pandas_mask(frame, selection):
+    specialties = build_specialty_index(frame['Spécialité'])
+    index = build_filter_index(frame, specialties)
+    mask = expected_mask(frame, selection)
+
+    assert index.count(selection) == mask.sum()
+    np.testing.assert_array_equal(index.rows(selection), np.flatnonzero(mask))
+    selected = frame[mask].reset_index(drop=True)
+    expected = build_cube(selected, build_specialty_index(selected['Spécialité']))
+    pd.testing.assert_frame_equal(index.cube(selection).table('Département', 'Spécialité'),
+                                  expected.table('Département', 'Spécialité'), check_names=False)
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import AXES, build_cube
+from data import derived_path, file_fingerprint, read_derived, snapshot_path
+from ingest import ingest, main, snapshot_at
+from specialties import build_specialty_index
+
+
+def versions(export):
+    # Three successive exports: rows removed, updated and inserted, a
+    # specialty disappearing and rows shuffled across chunks
+    first = export.iloc[:400]
+    second = export.iloc[50:450].copy()
+    second.loc[second.index[:30], 'Statut'] = 'Salarié'
+    second = second[~second['Spécialité'].str.startswith('Neurochirurgie')]
+    third = second.sample(frac=1, random_state=1)
+    third.loc[third.index[:20], 'OA'] = 'AFU'
+    third = pd.concat([third, export.iloc[450:]])
+    return [first, second, third]
+
+
+def canonical(frame):
+    # Rows as text in a fixed order, to compare frames whatever their dtypes
+    return frame.astype(str).sort_values(list(frame.columns)).reset_index(drop=True)
+
+
+def cube_tables(cube):
+    return {(x, y): cube.table(x, y) for i, x in enumerate(AXES) for y in AXES[i + 1:]}
+
+
+def assert_matches_rebuild(fingerprint):
+    # The cube and specialty index kept by ingest equal those built cold from
+    # the rows of the version
+    frame = pd.read_parquet(snapshot_path(fingerprint))
+    specialties = build_specialty_index(frame['Spécialité'])
+    cube = build_cube(frame, specialties)
+
+    ingested = read_derived(fingerprint, 'cube')
+    assert ingested.counts.sum() == cube.counts.sum() == len(frame)
+    for key, table in cube_tables(cube).items():
+        pd.testing.assert_frame_equal(cube_tables(ingested)[key], table)
+
+    index = read_derived(fingerprint, 'specialties')
+    assert index.tokens == specialties.tokens
+    np.testing.assert_array_equal(index.primary, specialties.primary)
+    assert (index.matrix != specialties.matrix).nnz == 0
+    assert index.postings.keys() == specialties.postings.keys()
+    assert list(ingested.labels['Spécialité']) == index.tokens
+
+
+def test_delta_cube_matches_rebuild(export, write_export, tmp_path):
+    store = tmp_path / 'store'
+    for number, rows in enumerate(versions(export), 1):
+        entry = ingest(write_export(rows, f'v{number}'), store, chunk_rows=100)
+        assert entry['version'] == number
+        assert_matches_rebuild(entry['fingerprint'])
+
+
+def test_previous_cube_recounted_when_missing(export, write_export, tmp_path):
+    store = tmp_path / 'store'
+    first, second, _ = versions(export)
+    entry = ingest(write_export(first, 'v1'), store, chunk_rows=100)
+    derived_path(entry['fingerprint'], 'cube').unlink()
+    entry = ingest(write_export(second, 'v2'), store, chunk_rows=100)
+    assert_matches_rebuild(entry['fingerprint'])
+
+
+def test_snapshot_at_replays_the_change_log(export, write_export, tmp_path):
+    store = tmp_path / 'store'
+    fingerprints = [ingest(write_export(rows, f'v{number}'), store, chunk_rows=100)['fingerprint']
+                    for number, rows in enumerate(versions(export), 1)]
+    for version, fingerprint in enumerate(fingerprints, 1):
+        pd.testing.assert_frame_equal(canonical(snapshot_at(version, store)),
+                                      canonical(pd.read_parquet(snapshot_path(fingerprint))))
+
+
+@pytest.mark.parametrize('refused', ['empty', 'quarantined'])
+def test_export_without_valid_rows_is_refused(export, write_export, tmp_path, refused):
+    store = tmp_path / 'store'
+    ingest(write_export(export.iloc[:400], 'v1'), store, chunk_rows=100)
+    before = {path.relative_to(store): path.read_bytes() for path in store.rglob('*') if path.is_file()}
+
+    rows = export.iloc[:0] if refused == 'empty' else export.iloc[400:450].assign(**{'N° RPPS': '123'})
+    path = write_export(rows, refused)
+    with pytest.raises(ValueError, match='no valid row to ingest'):
+        ingest(path, store, chunk_rows=100)
+    assert main([str(path), '--store', str(store)]) == 1
+
+    after = {path.relative_to(store): path.read_bytes() for path in store.rglob('*') if path.is_file()}
+    assert after == before
+    assert not snapshot_path(file_fingerprint(path)).exists()
+    assert len(json.loads((store / 'manifest.json').read_text())['versions']) == 1
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from similarity import build_similarity_index
+
+
+def table(rows, columns):
+    # Department x specialty counts, one list of counts per department
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns).rename_axis(
+        index='Département', columns='Spécialité')
+
+
+OLD = table({'01': [5, 1, 0], '13': [2, 2, 2], '59': [0, 3, 1], '75': [9, 0, 4]}, ['A', 'B', 'C'])
+# '13' changes, '59' leaves, '69' arrives and a new specialty 'D' appears in '75'
+NEW = table({'01': [5, 1, 0, 0], '13': [2, 5, 2, 0], '69': [1, 1, 1, 0], '75': [9, 0, 4, 3]},
+            ['A', 'B', 'C', 'D'])
+
+
+@pytest.mark.parametrize('new', [OLD, NEW, NEW.iloc[::-1], NEW[['D', 'C', 'B', 'A']]])
+def test_update_matches_a_full_rebuild(new):
+    updated = build_similarity_index(OLD).update(new)
+    rebuilt = build_similarity_index(new.reindex(columns=updated.specialties))
+
+    assert updated.departments.equals(rebuilt.departments)
+    assert updated.specialties.equals(rebuilt.specialties)
+    np.testing.assert_array_equal(updated.counts, rebuilt.counts)
+    np.testing.assert_allclose(updated.profiles, rebuilt.profiles)
+    np.testing.assert_allclose(updated.unit, rebuilt.unit)
+    for metric in ['cosine', 'jensen-shannon']:
+        pd.testing.assert_frame_equal(updated.neighbours('01', k=2, metric=metric),
+                                      rebuilt.neighbours('01', k=2, metric=metric))
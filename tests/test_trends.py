@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import accreditation_trends
+from cube import build_cube
+from data import read_csv
+from specialties import build_specialty_index
+from trends import clamp_window, window_metrics
+
+YEARS = pd.RangeIndex(2018, 2024, name='Year')
+
+
+def test_window_metrics_of_a_window_excluding_the_peak():
+    # Two series over 2018-2023: one peaking in 2019, before the window,
+    # one growing through it
+    counts = np.array([[1, 0], [9, 0], [5, 1], [4, 2], [3, 3], [2, 4]])
+    metrics = window_metrics(counts, YEARS, 2021, 2023)
+    np.testing.assert_array_equal(metrics['Start'], [4, 2])
+    np.testing.assert_array_equal(metrics['End'], [2, 4])
+    np.testing.assert_array_equal(metrics['Growth'], [-2, 2])
+    np.testing.assert_array_equal(metrics['Declining'], [True, False])
+    np.testing.assert_array_equal(metrics['Peak Year (window)'], [2021, 2023])
+    np.testing.assert_array_equal(metrics['Peak (window)'], [4, 4])
+    np.testing.assert_allclose(metrics['Relative Growth'], [-0.5, 1])
+
+
+def test_window_metrics_of_a_single_year():
+    counts = np.array([[1], [9], [5], [4], [3], [2]])
+    metrics = window_metrics(counts, YEARS, 2019, 2019)
+    assert metrics['Growth'][0] == 0
+    assert np.isnan(metrics['CAGR'][0])
+    assert metrics['Peak Year (window)'][0] == 2019
+
+
+@pytest.mark.parametrize('window, expected', [
+    ((2018, 2023), (2018, 2023)),
+    ((2010, 2030), (2018, 2023)),
+    ((2010, 2020), (2018, 2020)),
+    ((2021, 2030), (2021, 2023)),
+    ((2023, 2023), (2023, 2023)),
+])
+def test_clamp_window_to_the_years_of_the_data(window, expected):
+    assert clamp_window(YEARS, *window) == expected
+
+
+@pytest.mark.parametrize('window', [(2010, 2017), (2024, 2030), (2021, 2020)])
+def test_clamp_window_without_data(window):
+    with pytest.raises(ValueError, match='no data between'):
+        clamp_window(YEARS, *window)
+
+
+def test_declining_peak_year_is_over_all_years(export, write_export):
+    # One specialty with 6 accreditations in 2019, then 3 in 2021 and 1 in
+    # 2023: declining over 2021-2023, with its peak before that window
+    rows = export[export['Spécialité'].str.startswith('Gynécologie-obstétrique')].head(10).copy()
+    rows['Date accréditation'] = ['15/03/2019'] * 6 + ['15/03/2021'] * 3 + ['15/03/2023']
+    frame = read_csv(write_export(rows, 'gynecology'))
+    cube = build_cube(frame, build_specialty_index(frame['Spécialité']))
+
+    analysis = accreditation_trends(cube, start_year=2021, end_year=2030)
+    assert (analysis.start_year, analysis.end_year) == (2021, 2023)
+    declining = analysis.declining.loc['Gynécologie-obstétrique']
+    assert declining['Decline'] == -2
+    assert declining['Peak Year'] == 2019
+
+    departments = analysis.departments.xs('Gynécologie-obstétrique', level='Spécialité')
+    assert (departments['Peak Year (window)'] >= 2021).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from data import read_csv
+from validation import Validator, digits, luhn_valid
+
+
+def luhn(number):
+    # Reference Luhn check: from the right, every second digit is doubled
+    total = 0
+    for position, digit in enumerate(int(char) for char in reversed(number)):
+        if position % 2:
+            digit = digit * 2 - 9 if digit > 4 else digit * 2
+        total += digit
+    return total % 10 == 0
+
+
+def test_luhn_valid_matches_the_reference(export):
+    rng = np.random.default_rng(0)
+    numbers = export['N° RPPS'].tolist() + [''.join(rng.choice(list('0123456789'), 11)) for _ in range(500)]
+    np.testing.assert_array_equal(luhn_valid(digits(numbers, 11)), [luhn(number) for number in numbers])
+
+
+def test_shipped_rpps_numbers_pass(export):
+    assert luhn_valid(digits(export['N° RPPS'].tolist(), 11)).all()
+
+
+@pytest.mark.parametrize('rpps, reason', [
+    (None, 'rpps_missing'),
+    ('1000517138', 'rpps_format'),
+    ('1000517138X', 'rpps_format'),
+    # A non-ASCII digit is not a digit of an RPPS number
+    ('1000517138²', 'rpps_format'),
+    ('10005171384', 'rpps_checksum'),
+])
+def test_invalid_rpps_is_quarantined(export, write_export, rpps, reason):
+    rows = export.head(3).copy()
+    rows.loc[rows.index[1], 'N° RPPS'] = rpps
+    validator = Validator()
+    kept = read_csv(write_export(rows, 'rpps'), validator)
+
+    quarantined = validator.report().quarantined
+    assert len(kept) == 2
+    assert quarantined.index.tolist() == [3]
+    assert quarantined['Reasons'].tolist() == [reason]
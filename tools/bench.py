@@ -0,0 +1,190 @@
+"""Benchmark the load -> aggregate -> model -> render pipeline.
+
+Each stage is timed on its own (best and median of --repeat runs) and then run
+once more under tracemalloc for its peak allocated memory. Results are JSON
+lines, one record per (rows, stage), tagged with the git commit so that runs
+on different commits can be compared.
+
+    python -m tools.bench --sizes 10k 1m -o bench.jsonl
+    python -m tools.bench --csv export.csv
+    python -m tools.bench --compare base.jsonl head.jsonl
+
+Note that tracemalloc sees NumPy and Python allocations but not Arrow's own
+memory pool, so Parquet/Arrow buffers are not included in peak_mb.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Every stage is timed uncached: the disk cache shared by the app processes
+# is disabled before the modules below bind it, so that the model and render
+# stages neither read its entries nor add their own to it
+os.environ['HAS_CACHE_DIR'] = ''
+
+import pandas as pd
+# models.py imports sklearn on its first fit: imported here so that the
+# model_fit stage times the fits, not the import
+import sklearn.cluster
+import sklearn.decomposition
+import sklearn.preprocessing
+
+import charts
+import disk_cache
+from cube import build_cube
+from data import read_csv
+from models import clear_model_cache, fit_projection
+from specialties import build_specialty_index
+from tools.synth_data import generate, parse_size
+
+
+REGRESSION_THRESHOLD = 1.2
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        'wall_s_min': round(min(times), 6),
+        'wall_s_median': round(statistics.median(times), 6),
+        'peak_mb': round(peak / 2**20, 3),
+    }
+
+
+def legacy_tables(raw):
+    # The groupby().unstack() tables of both cases, as computed before the cube
+    raw = raw.assign(Year=pd.to_datetime(raw['Date accréditation'], format='%d/%m/%Y', errors='coerce').dt.year)
+    dept_specialty = raw.groupby(['Département', 'Spécialité']).size().unstack(fill_value=0)
+    year_specialty = raw.groupby(['Year', 'Spécialité']).size().unstack(fill_value=0)
+    gynecology = raw[raw['Spécialité'].str.contains('Gynécologie-obstétrique', na=False)]
+    gynecology_by_dept = gynecology.groupby(['Year', 'Département']).size().unstack(fill_value=0)
+    return dept_specialty, year_specialty, gynecology_by_dept
+
+
+def cube_tables(cube):
+    return (
+        cube.table('Département', 'Spécialité'),
+        cube.table('Year', 'Spécialité'),
+        cube.table('Year', 'Département', where={'Spécialité': 'Gynécologie-obstétrique'}),
+    )
+
+
+def fit_uncached(table):
+    clear_model_cache()
+    disk_cache.clear()
+    return fit_projection(table, n_components=2, n_clusters=3, random_state=42)
+
+
+def render_charts(dept_specialty, year_specialty, projection):
+    # Uncached rendering of one chart of each kind
+    charts.clear_chart_cache()
+    disk_cache.clear()
+    charts.line_chart(year_specialty, 'Trends', 'Year', 'Count', legend_title='Specialty')
+    charts.bar_chart(dept_specialty.sum().to_frame('Count'), 'Totals', 'Specialty', 'Count')
+    charts.scatter_chart(projection, x='PC1', y='PC2', hue='Cluster', palette={0: 'blue', 1: 'gray', 2: 'red'},
+                         title='PCA')
+
+
+def run(path, repeat):
+    rows = sum(1 for _ in open(path, encoding='utf-8')) - 1
+    stages = {}
+
+    raw, stages['csv_load_raw'] = measure(lambda: pd.read_csv(path), repeat)
+    frame, stages['csv_load_typed'] = measure(lambda: read_csv(path), repeat)
+    specialties, stages['specialty_index'] = measure(lambda: build_specialty_index(frame['Spécialité']), repeat)
+    cube, stages['cube_build'] = measure(lambda: build_cube(frame, specialties), repeat)
+    _, stages['groupby_tables'] = measure(lambda: legacy_tables(raw), repeat)
+    (dept_specialty, year_specialty, _), stages['cube_tables'] = measure(lambda: cube_tables(cube), repeat)
+    fit, stages['model_fit'] = measure(lambda: fit_uncached(dept_specialty), repeat)
+    _, stages['render'] = measure(lambda: render_charts(dept_specialty, year_specialty, fit.projection), repeat)
+
+    base = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'rows': rows,
+        'file': str(path),
+    }
+    return [dict(base, stage=stage, **metrics) for stage, metrics in stages.items()]
+
+
+def compare(base_path, head_path):
+    # Ratio head/base of the best wall time and of the peak memory per stage
+    def read(path):
+        records = [json.loads(line) for line in open(path) if line.strip()]
+        return {(record['rows'], record['stage']): record for record in records}
+
+    base, head = read(base_path), read(head_path)
+    regressions = 0
+    print(f"{'rows':>10}  {'stage':<16} {'time':>8} {'memory':>8}")
+    for key in sorted(base.keys() & head.keys()):
+        time_ratio = head[key]['wall_s_min'] / max(base[key]['wall_s_min'], 1e-9)
+        memory_ratio = head[key]['peak_mb'] / max(base[key]['peak_mb'], 1e-9)
+        flag = ''
+        if max(time_ratio, memory_ratio) > REGRESSION_THRESHOLD:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f'{key[0]:>10}  {key[1]:<16} {time_ratio:7.2f}x {memory_ratio:7.2f}x{flag}')
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', type=Path, nargs='*', default=[], help='existing exports to benchmark')
+    parser.add_argument('--sizes', nargs='*', default=[], help='synthetic sizes to generate, e.g. 10k 1m 10m')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', type=Path, help='append the JSON lines to this file')
+    parser.add_argument('--compare', type=Path, nargs=2, metavar=('BASE', 'HEAD'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list(args.csv)
+        for size in args.sizes:
+            path = Path(tmp) / f'synthetic-{size}.csv'
+            generate(parse_size(size), path)
+            paths.append(path)
+        if not paths:
+            parser.error('nothing to benchmark: pass --csv and/or --sizes')
+
+        output = open(args.output, 'a') if args.output else sys.stdout
+        try:
+            for path in paths:
+                for record in run(path, args.repeat):
+                    print(json.dumps(record), file=output, flush=True)
+        finally:
+            if args.output:
+                output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
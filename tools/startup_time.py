@@ -0,0 +1,77 @@
+"""Measure the cold start of the Overview page.
+
+Runs app.py in a fresh interpreter under ``python -X importtime`` (Streamlit
+bare mode, no server) and reports the wall time, the slowest top-level
+imports and whether any heavy dependency was pulled in by the landing page.
+
+    python tools/startup_time.py [--top 15] [--json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+APP = Path(__file__).resolve().parent.parent / 'app.py'
+# Modules the Overview page should never import
+HEAVY_MODULES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'pyarrow']
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(app=APP):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(app)],
+        cwd=app.parent, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+
+    imports = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({
+                'module': name,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': len(indent) // 2,
+            })
+
+    top_level = [entry for entry in imports if entry['depth'] == 0]
+    imported = {entry['module'].split('.')[0] for entry in imports}
+    return {
+        'returncode': process.returncode,
+        'wall_s': round(wall, 4),
+        'import_total_us': sum(entry['self_us'] for entry in imports),
+        'heavy_imported': sorted(imported & set(HEAVY_MODULES)),
+        'top_imports': sorted(top_level, key=lambda entry: entry['cumulative_us'], reverse=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=15, help='number of top-level imports to show')
+    parser.add_argument('--json', action='store_true', help='print a single JSON record')
+    args = parser.parse_args(argv)
+
+    result = measure()
+    result['top_imports'] = result['top_imports'][:args.top]
+    if args.json:
+        print(json.dumps(result))
+        return result['returncode']
+
+    print(f"Overview cold start: {result['wall_s']:.2f}s wall, "
+          f"{result['import_total_us'] / 1e6:.2f}s in imports")
+    print(f"Heavy modules imported: {', '.join(result['heavy_imported']) or 'none'}")
+    for entry in result['top_imports']:
+        print(f"  {entry['cumulative_us'] / 1e3:9.1f} ms  {entry['module']}")
+    return result['returncode']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Generate a synthetic HAS accreditation export of any size.
+
+The output follows the real CSV schema and formats: raw multi-valued
+'Spécialité' strings (non-breaking spaces included), dd/mm/YYYY dates,
+alphanumeric FINESS codes and department codes such as "2A" or "971".
+Distributions are resampled from the real export:
+  - Spécialité, OA, Nom équipe and Statut jointly, from one practitioner row
+  - Département and FINESS jointly, from another row
+  - Date accréditation independently
+RPPS numbers are synthetic but carry a valid Luhn check digit, and names are
+recombined from the real first and last names.
+
+    python -m tools.synth_data 1m -o synthetic-1m.csv [--seed 0]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data import COLUMNS, CSV_PATH
+
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 500_000
+
+
+def parse_size(value):
+    value = value.lower()
+    return SIZES[value] if value in SIZES else int(value.replace('_', ''))
+
+
+def rpps_numbers(rng, n):
+    # 10-digit body starting with "10" followed by a Luhn check digit
+    body = 1_000_000_000 + rng.integers(0, 20_000_000, size=n)
+    digits = (body[:, None] // 10 ** np.arange(10)) % 10  # rightmost digit first
+    doubled = digits[:, 0::2] * 2
+    total = (doubled - 9 * (doubled > 9)).sum(axis=1) + digits[:, 1::2].sum(axis=1)
+    return body * 10 + (10 - total % 10) % 10
+
+
+def generate(rows, output, source=CSV_PATH, seed=0, chunk_rows=CHUNK_ROWS):
+    # Written chunk by chunk so that memory does not grow with `rows`
+    real = pd.read_csv(source, dtype=str, keep_default_na=False)
+    rng = np.random.default_rng(seed)
+
+    practice = real[['Spécialité', 'OA', 'Nom équipe', 'Statut']].to_numpy()
+    location = real[['Département', 'FINESS']].to_numpy()
+    dates = real['Date accréditation'].to_numpy()
+    last_names = real['Nom'].unique()
+    first_names = real['Prénom'].unique()
+
+    written = 0
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            practice_rows = practice[rng.integers(len(practice), size=n)]
+            location_rows = location[rng.integers(len(location), size=n)]
+            chunk = pd.DataFrame({
+                'N° RPPS': rpps_numbers(rng, n),
+                'Nom': last_names[rng.integers(len(last_names), size=n)],
+                'Prénom': first_names[rng.integers(len(first_names), size=n)],
+                'Spécialité': practice_rows[:, 0],
+                'Date accréditation': dates[rng.integers(len(dates), size=n)],
+                'OA': practice_rows[:, 1],
+                'Nom équipe': practice_rows[:, 2],
+                'Département': location_rows[:, 0],
+                'FINESS': location_rows[:, 1],
+                'Statut': practice_rows[:, 3],
+            }, columns=COLUMNS)
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += n
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', help='number of rows, or one of ' + ', '.join(SIZES))
+    parser.add_argument('-o', '--output', type=Path, required=True)
+    parser.add_argument('--source', type=Path, default=CSV_PATH, help='real export to resample from')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.rows)
+    generate(rows, args.output, args.source, args.seed)
+    print(f'Wrote {rows} rows to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Trend engine for Case 2. Metrics are array operations along the year axis
+# of a year x specialty x department count tensor, so one call covers every
+# specialty x department pair at once, for any window of years.
+
+
+@dataclass(frozen=True)
+class TrendTensor:
+    years: pd.Index           # consecutive years, a year without accreditations counts 0
+    specialties: pd.Index
+    departments: pd.Index
+    counts: np.ndarray        # years x specialties x (departments + 1): the last
+                              # slot holds the rows without a department
+
+    def by_specialty(self):
+        # National years x specialties counts, rows without a department included
+        return pd.DataFrame(self.counts.sum(axis=2), index=self.years, columns=self.specialties)
+
+
+def build_tensor(cube):
+    # Sum the Statut and OA axes out of the count cube and spread its years
+    # over a consecutive range
+    counts = cube.counts.sum(axis=(cube.axis('Statut'), cube.axis('OA')))
+    years, specialties = cube.labels['Year'], cube.labels['Spécialité']
+    # Year x department x specialty without the missing year and specialty
+    # slots, nor the years without accreditations (e.g. in a filtered cube)
+    counts = counts[:len(years), :, :len(specialties)].transpose(0, 2, 1)
+    present = counts.sum(axis=(1, 2)) > 0
+    years, counts = years[present], counts[present]
+
+    consecutive = pd.RangeIndex(int(years.min()), int(years.max()) + 1, name='Year') if len(years) else \
+        pd.RangeIndex(0, name='Year')
+    tensor = np.zeros((len(consecutive), *counts.shape[1:]), dtype=counts.dtype)
+    tensor[consecutive.get_indexer(years.astype(int))] = counts
+    return TrendTensor(
+        years=consecutive,
+        specialties=specialties.rename('Spécialité'),
+        departments=cube.labels['Département'].rename('Département'),
+        counts=tensor,
+    )
+
+
+def clamp_window(years, start_year, end_year):
+    # The part of [start_year, end_year] covered by the data
+    start_year, end_year = max(start_year, int(years[0])), min(end_year, int(years[-1]))
+    if start_year > end_year:
+        raise ValueError(f'no data between {start_year} and {end_year}')
+    return start_year, end_year
+
+
+def rolling_mean(counts, window):
+    # Trailing mean over `window` years along the first axis (over fewer
+    # years for the first ones), from one cumulative sum
+    cumulative = np.cumsum(counts, axis=0, dtype=float)
+    previous = np.zeros_like(cumulative)
+    previous[window:] = cumulative[:-window]
+    lengths = np.minimum(np.arange(1, len(counts) + 1), window).reshape(-1, *[1] * (counts.ndim - 1))
+    return (cumulative - previous) / lengths
+
+
+def window_metrics(counts, years, start_year, end_year, rolling=3):
+    # Metrics of the window [start_year, end_year] for every series of
+    # `counts` (consecutive years along the first axis), each returned as an
+    # array shaped like one year of counts
+    first, last = np.searchsorted(np.asarray(years), [start_year, end_year])
+    window = counts[first:last + 1]
+    start, end = counts[first], counts[last]
+    span = end_year - start_year
+    smoothed = rolling_mean(counts, rolling)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(start > 0, (end - start) / start, np.nan)
+        cagr = np.where(start > 0, (end / start) ** (1 / span) - 1, np.nan) if span else np.full(start.shape, np.nan)
+    return {
+        'Start': start,
+        'End': end,
+        'Growth': end - start,
+        'Relative Growth': relative,
+        'CAGR': cagr,
+        'Rolling Start': smoothed[first],
+        'Rolling End': smoothed[last],
+        'Rolling Growth': smoothed[last] - smoothed[first],
+        'Peak Year (window)': np.asarray(years)[first + window.argmax(axis=0)],
+        'Peak (window)': window.max(axis=0),
+        'Declining': end < start,
+    }
+
+
+def trend_table(tensor, start_year, end_year, rolling=3):
+    # Window metrics of every specialty x department pair with at least one
+    # accreditation, one row per pair
+    counts = tensor.counts[:, :, :len(tensor.departments)]
+    metrics = window_metrics(counts, tensor.years, start_year, end_year, rolling)
+    index = pd.MultiIndex.from_product([tensor.specialties, tensor.departments])
+    table = pd.DataFrame({name: values.ravel() for name, values in metrics.items()}, index=index)
+    return table[counts.sum(axis=0).ravel() > 0]
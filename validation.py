@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from geography import read_reference
+from profiling import stage
+from specialties import KNOWN_TOKENS, parse_specialty
+
+
+# Data-quality checks run by the loader on every chunk read from the CSV.
+# Each check is a column-wise test over the chunk; the checks of categorical
+# columns test every distinct value once and reach the rows through the
+# codes, so the cost per row stays a few array operations. Rows failing an
+# 'error' check are quarantined: kept out of the dataset and listed with
+# their reasons. 'warning' checks only report the rows.
+MIN_DATE = pd.Timestamp('2005-01-01')
+CHECKS = {
+    # name: (severity, column, description)
+    'rpps_missing': ('error', 'N° RPPS', 'RPPS number missing'),
+    'rpps_format': ('error', 'N° RPPS', 'RPPS number is not 11 digits'),
+    'rpps_checksum': ('error', 'N° RPPS', 'RPPS number fails its Luhn check digit'),
+    'date_missing': ('error', 'Date accréditation', 'accreditation date missing'),
+    'date_format': ('error', 'Date accréditation', 'accreditation date is not a DD/MM/YYYY date'),
+    'date_range': ('error', 'Date accréditation', f'accreditation date before {MIN_DATE:%d/%m/%Y} or in the future'),
+    'department_unknown': ('error', 'Département', 'department code not in departements.csv'),
+    'duplicate': ('error', None, 'same RPPS, specialty, date and FINESS as an earlier row'),
+    'department_missing': ('warning', 'Département', 'department missing'),
+    'finess_format': ('warning', 'FINESS', 'FINESS is not a department code followed by 7 digits'),
+    'finess_checksum': ('warning', 'FINESS', 'FINESS fails its Luhn check digit'),
+    'specialty_unknown': ('warning', 'Spécialité', 'specialty not in the known list'),
+    'statut_unknown': ('warning', 'Statut', 'unexpected Statut'),
+    'oa_unknown': ('warning', 'OA', 'unexpected accrediting body (OA)'),
+}
+KNOWN_STATUT = ['Libéral', 'Libéral et salarié', 'Salarié', 'Médecin militaire']
+KNOWN_OA = [
+    'AFU', 'CEFA-HGE', 'CFAR', 'Cardiorisq - ODP2C', 'Collège de Neurochirurgie', 'FCVD', 'GYNERISQ',
+    'MAXILLORISQ', 'OA CHIRPED', 'ODPC-RIM', 'ORL-DPC', 'ORTHORISQ', 'PLASTIRISQ', 'SFCTCV', 'VASCURISQ',
+]
+DUPLICATE_KEY = ['N° RPPS', 'Spécialité', 'Date accréditation', 'FINESS']
+
+
+def digits(values, width):
+    # n x width array of the digits of strings of exactly `width` ASCII digits
+    return np.frombuffer(np.asarray(values, dtype=f'S{width}').tobytes(), dtype=np.uint8).reshape(-1, width) - ord('0')
+
+
+def luhn_valid(digits):
+    # Luhn check of each row of digits, the last one being the check digit
+    doubled = digits.astype(np.int16)
+    doubled[:, -2::-2] *= 2
+    doubled[doubled > 9] -= 9
+    return doubled.sum(axis=1) % 10 == 0
+
+
+def by_category(values, test):
+    # test(categories) -> one boolean per category, broadcast to the rows;
+    # missing values pass
+    values = values.astype('category')
+    result = np.append(np.asarray(test(values.cat.categories), dtype=bool), False)
+    return result[values.cat.codes.to_numpy()]
+
+
+def invalid_checksum(values, width):
+    # Values of `width` digits whose check digit is wrong
+    values = pd.Series(values, dtype=object)
+    numeric = values.str.fullmatch(rf'[0-9]{{{width}}}').fillna(False).to_numpy(dtype=bool)
+    invalid = np.zeros(len(values), dtype=bool)
+    invalid[numeric] = ~luhn_valid(digits(values[numeric].to_numpy(), width))
+    return invalid
+
+
+def run_checks(raw, typed):
+    # Rows failing each check (except duplicates, see Validator), raw being
+    # the text columns the typed chunk was converted from
+    departments = read_reference().index
+    rpps, date = raw['N° RPPS'], raw['Date accréditation']
+    parsed = typed['Date accréditation']
+    well_formed = rpps.str.fullmatch(r'[0-9]{11}').fillna(False).to_numpy(dtype=bool)
+    checksum = np.zeros(len(raw), dtype=bool)
+    checksum[well_formed] = ~luhn_valid(digits(rpps[well_formed].to_numpy(), 11))
+    today = pd.Timestamp.today().normalize()
+
+    return {
+        'rpps_missing': rpps.isna().to_numpy(),
+        'rpps_format': (rpps.notna() & ~well_formed).to_numpy(),
+        'rpps_checksum': checksum,
+        'date_missing': date.isna().to_numpy(),
+        'date_format': (date.notna() & parsed.isna()).to_numpy(),
+        'date_range': ((parsed < MIN_DATE) | (parsed > today)).to_numpy(dtype=bool),
+        'department_unknown': by_category(typed['Département'], lambda codes: ~codes.isin(departments)),
+        'department_missing': typed['Département'].isna().to_numpy(),
+        'finess_format': by_category(
+            typed['FINESS'], lambda codes: ~pd.Series(codes, dtype=object).str.fullmatch(r'([0-9]{2}|2A|2B)[0-9]{7}')),
+        'finess_checksum': by_category(typed['FINESS'], lambda codes: invalid_checksum(codes, 9)),
+        'specialty_unknown': by_category(typed['Spécialité'], lambda values: [
+            any(token not in KNOWN_TOKENS for token in parse_specialty(value)) for value in values]),
+        'statut_unknown': by_category(typed['Statut'], lambda values: ~values.isin(KNOWN_STATUT)),
+        'oa_unknown': by_category(typed['OA'], lambda values: ~values.isin(KNOWN_OA)),
+    }
+
+
+@dataclass
+class QualityReport:
+    rows: int                   # rows read from the file
+    quarantined: pd.DataFrame   # raw values of the quarantined rows and their 'Reasons', by file line
+    issues: pd.DataFrame        # 'Line', 'Check' and 'Value' of every failed check of a row
+
+    def summary(self):
+        # One row per check with the number of rows failing it
+        counts = self.issues['Check'].value_counts()
+        return pd.DataFrame([
+            {'Check': name, 'Severity': severity, 'Column': column or 'all key columns',
+             'Description': description, 'Rows': int(counts.get(name, 0))}
+            for name, (severity, column, description) in CHECKS.items()
+        ]).set_index('Check')
+
+
+class Validator:
+    # Validates the chunks of one file, in order: duplicates are detected
+    # across chunks through the hashes of the keys of the rows kept so far,
+    # sorted so that each chunk is looked up and merged in with searchsorted
+    def __init__(self):
+        self.rows = 0
+        self._kept_keys = np.empty(0, dtype=np.uint64)
+        self._issues = []
+        self._quarantined = []
+
+    def duplicates(self, keys, valid):
+        # Rows whose key is that of an earlier kept row: a row of an earlier
+        # chunk, or a row of this chunk passing the other 'error' checks
+        positions = np.searchsorted(self._kept_keys, keys)
+        seen = self._kept_keys[np.minimum(positions, len(self._kept_keys) - 1)] == keys \
+            if len(self._kept_keys) else np.zeros(len(keys), dtype=bool)
+        rows = np.arange(len(keys))
+        first_valid = pd.Series(rows[valid], index=keys[valid])
+        first_valid = first_valid[~first_valid.index.duplicated()]
+        earlier = first_valid.reindex(keys).to_numpy() < rows
+        return seen | earlier
+
+    def check(self, raw, typed):
+        # The rows of `typed` that pass every 'error' check
+        with stage('validate'):
+            failures = run_checks(raw, typed)
+            invalid = np.zeros(len(raw), dtype=bool)
+            for name, failed in failures.items():
+                if CHECKS[name][0] == 'error':
+                    invalid |= failed
+            keys = pd.util.hash_pandas_object(typed[DUPLICATE_KEY], index=False).to_numpy()
+            failures['duplicate'] = self.duplicates(keys, ~invalid)
+            kept_keys = np.sort(keys[~invalid & ~failures['duplicate']])
+            self._kept_keys = np.insert(self._kept_keys, np.searchsorted(self._kept_keys, kept_keys), kept_keys)
+            self.rows += len(raw)
+
+            # CSV line of each row: after the header, counting from 1
+            lines = raw.index.to_numpy() + 2
+            rejected = np.zeros(len(raw), dtype=bool)
+            reasons = np.full(len(raw), '', dtype=object)
+            for name, (severity, column, _) in CHECKS.items():
+                failed = failures[name]
+                if not failed.any():
+                    continue
+                self._issues.append(pd.DataFrame({
+                    'Line': lines[failed],
+                    'Check': name,
+                    'Value': raw[column][failed].to_numpy(dtype=object) if column else None,
+                }))
+                if severity == 'error':
+                    rejected |= failed
+                    reasons[failed] += name + ' '
+
+            if not rejected.any():
+                return typed
+            self._quarantined.append(raw[rejected].assign(Line=lines[rejected], Reasons=reasons[rejected]))
+            kept = typed[~rejected]
+            # Values only seen in quarantined rows (e.g. an unknown department)
+            # must not become categories of the dataset
+            for column in kept.select_dtypes('category'):
+                kept[column] = kept[column].cat.remove_unused_categories()
+            return kept
+
+    def report(self):
+        quarantined = pd.concat(self._quarantined) if self._quarantined else \
+            pd.DataFrame(columns=[*DUPLICATE_KEY, 'Line', 'Reasons'])
+        quarantined['Reasons'] = quarantined['Reasons'].str.strip().str.replace(' ', ', ')
+        issues = pd.concat(self._issues, ignore_index=True) if self._issues else \
+            pd.DataFrame({'Line': pd.Series(dtype=np.int64), 'Check': pd.Series(dtype=object), 'Value': pd.Series(dtype=object)})
+        return QualityReport(rows=self.rows, quarantined=quarantined.set_index('Line'), issues=issues)